@@ -0,0 +1,145 @@
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import tempfile
+from datetime import datetime
+from time import perf_counter
+import numpy as np
+import pandas as pd
+import scripts.ev_scheduling as ev
+import scripts.import_data as input
+import scripts.output_data as output
+
+
+def make_synthetic_month(num_days, num_periods_day, seed=0):
+    # prices with a daily shape plus noise and loads in kWh per period, like the real data
+    rng = np.random.default_rng(seed)
+    shape_day = 60 + 30 * np.sin(np.linspace(0, np.pi, num_periods_day))
+    prices_2d = shape_day[None, :] + rng.normal(0, 10, (num_days, num_periods_day))
+    loads_2d = 20 + rng.normal(0, 3, (num_days, num_periods_day))
+    return prices_2d, loads_2d
+
+
+def write_synthetic_csvs(data_dir, num_days, resolution=30, seed=0):
+    # price and load files in the same format as data/wholesale_data.csv and data/load_data.csv
+    num_periods_day = 24 * 60 // resolution
+    prices_2d, loads_2d = make_synthetic_month(num_days, num_periods_day, seed)
+    datetimes = pd.date_range("2019-03-01", periods=num_days * num_periods_day, freq=f"{resolution}min")
+    file_prices_data = os.path.join(data_dir, "wholesale_data.csv")
+    file_load_data = os.path.join(data_dir, "load_data.csv")
+    pd.DataFrame({"Datetime": datetimes, "WholesalePrice": prices_2d.ravel()}).to_csv(file_prices_data, index=False)
+    pd.DataFrame({"Datetime": datetimes, "E": loads_2d.ravel()}).to_csv(file_load_data, index=False)
+    return file_prices_data, file_load_data
+
+
+def time_call(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start_time = perf_counter()
+        result = function()
+        times.append(perf_counter() - start_time)
+    return result, {"min (s)": min(times), "median (s)": float(np.median(times)), "repeats": repeats}
+
+
+def read_all_data(file_prices_data, file_load_data, store_dir):
+    # read_data returns views of the memory-mapped store, the sums read every month as a run does
+    prices_year, loads_year, _, _ = input.read_data("9:00", "16:30", file_prices_data, file_load_data,
+                                                    store_dir=store_dir)
+    return sum(np.asarray(prices_2d).sum() + np.asarray(loads_2d).sum()
+               for prices_2d, loads_2d in zip(prices_year, loads_year))
+
+
+def benchmark_read_data(num_days_data, repeats):
+    records = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        file_prices_data, file_load_data = write_synthetic_csvs(data_dir, num_days_data)
+        store_dir = os.path.join(data_dir, "store")
+        _, timing = time_call(lambda: input.ingest_data(file_prices_data, file_load_data, store_dir), repeats)
+        records.append(dict(stage="ingest_data", num_days=num_days_data, **timing))
+        _, timing = time_call(lambda: read_all_data(file_prices_data, file_load_data, store_dir), repeats)
+        records.append(dict(stage="read_data", num_days=num_days_data, **timing))
+    return records
+
+
+def benchmark_scheduling(num_evs_list, num_days_list, num_periods_day_list, tariffs, backends, aggregate,
+                         repeats, render):
+    records = []
+    for num_evs, num_days, num_periods_day, (network_tariff_peak, network_tariff_off_peak), backend \
+            in itertools.product(num_evs_list, num_days_list, num_periods_day_list, tariffs, backends):
+        scenario = dict(num_evs=num_evs, num_days=num_days, num_periods_day=num_periods_day,
+                        network_tariff_peak=network_tariff_peak, network_tariff_off_peak=network_tariff_off_peak,
+                        backend=backend, aggregate=aggregate)
+        print(f"Benchmarking {scenario}...")
+
+        # the last eighth of the day is the peak
+        prices_2d, loads_2d = make_synthetic_month(num_days, num_periods_day)
+        num_peak_periods = max(1, num_periods_day // 8)
+        peak_periods = set(range(num_periods_day - num_peak_periods, num_periods_day))
+        off_peak_periods = set(range(num_periods_day - num_peak_periods))
+
+        (charge_ev_day_period, minizinc_outputs), timing \
+            = time_call(lambda: ev.schedule_evs(num_days, num_periods_day, peak_periods, off_peak_periods,
+                                                num_evs, 25, 20, prices_2d, loads_2d,
+                                                network_tariff_peak, network_tariff_off_peak,
+                                                aggregate=aggregate, backend=backend), repeats)
+        records.append(dict(stage="schedule_evs", **scenario, **timing,
+                            solver_time_ms=minizinc_outputs["time (ms)"][0],
+                            # the model build and, for MiniZinc, the flattening
+                            overhead_ms=timing["median (s)"] * 1000 - minizinc_outputs["time (ms)"][0],
+                            objective=minizinc_outputs["wholesale_cost"][0] + minizinc_outputs["network_charge"][0]))
+
+        datetime_month = (np.arange(num_days).astype("datetime64[D]")[:, None]
+                          + np.arange(num_periods_day) * np.timedelta64(30, "m")).ravel()
+        merged_data_dict, timing \
+            = time_call(lambda: output.merge_results(charge_ev_day_period, loads_2d.ravel(), prices_2d.ravel(),
+                                                     datetime_month, minizinc_outputs["max_demand_peak"],
+                                                     minizinc_outputs["max_demand_off_peak"]), repeats)
+        records.append(dict(stage="merge_results", **scenario, **timing))
+
+        if render:
+            _, timing = time_call(lambda: output.visualise_monthly_results("benchmark", datetime_month,
+                                                                           merged_data_dict, prices_2d.ravel(),
+                                                                           minizinc_outputs), repeats)
+            records.append(dict(stage="visualise_monthly_results", **scenario, **timing))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the EV scheduling pipeline on synthetic data.")
+    parser.add_argument("--num-evs", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--num-days", type=int, nargs="+", default=[7, 31])
+    parser.add_argument("--num-periods-day", type=int, nargs="+", default=[16, 48])
+    parser.add_argument("--tariffs", type=float, nargs=2, action="append", metavar=("PEAK", "OFF_PEAK"),
+                        help="network tariff pair in $/kW, can be repeated (default: 0 0 and 15 3)")
+    parser.add_argument("--backends", nargs="+",
+                        default=["highs", "greedy"] + (["minizinc"] if importlib.util.find_spec("minizinc") else []),
+                        help="default highs, greedy and, when it is installed, minizinc")
+    parser.add_argument("--aggregate", action="store_true", help="solve the fleet-aggregated model")
+    parser.add_argument("--num-days-data", type=int, default=365, help="days of synthetic CSV data to ingest")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--render", action="store_true", help="also benchmark the Bokeh figures")
+    parser.add_argument("--output", default=f"results/benchmark-{datetime.now().strftime('%m-%d-%H-%M')}.json")
+    args = parser.parse_args()
+
+    records = benchmark_read_data(args.num_days_data, args.repeats)
+    records += benchmark_scheduling(args.num_evs, args.num_days, args.num_periods_day,
+                                    args.tariffs or [(0, 0), (15, 3)], args.backends, args.aggregate,
+                                    args.repeats, args.render)
+    report = {
+        "created": datetime.now().isoformat(),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(),
+                    "cpu_count": os.cpu_count(), "python": platform.python_version(), "numpy": np.__version__},
+        "args": vars(args),
+        "records": records,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark report to {args.output}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,97 +1,264 @@
+import argparse
 import numpy as np
-from pandas_bokeh import *
-from bokeh.layouts import layout
-from bokeh.models import *
-from bokeh.plotting import output_file
-from datetime import datetime, date
-import scripts.ev_scheduling as ev
+from collections import deque
+from datetime import datetime
 import scripts.import_data as input
-import scripts.output_data as output
+import scripts.profiling as profiling
+import scripts.result_store as store
+import scripts.scenario_runner as runner
+import scripts.tariff_calendar as calendar
 
 now_datetime = str(datetime.now().strftime("%m-%d-%H-%M"))
 
-# time-related parameters
+# the constants below are the defaults of the command line arguments, see python main.py --help
+
+# data-related parameters
+file_prices_data = "data/wholesale_data.csv"
+file_load_data = "data/load_data.csv"
+store_dir = "data/store"
+
+# time-related parameters, the resolution (and so the length of a period) comes from the data
 start_time_day = "9:00"
-end_time_day = "16:30"
-num_periods_day = len(pd.date_range(start=start_time_day, end=end_time_day, freq='30Min'))
-peak_periods = {14, 15}
-off_peak_periods = {i for i in range(14)}
+end_time_day = "16:30"  # the start time of the last period, a window can run over midnight
+peak_windows = calendar.default_peak_windows  # the peak network tariff applies from 16:00 to 22:00
 
 # EV-related parameters
 num_evs = 1000
 max_charge = 25  # kW
 total_energy = 20  # kWh
+aggregate_evs = True  # solve one fleet charge per period instead of one per EV
+
+# solver-related parameters
+backend = "minizinc"  # "minizinc", "highs" for the in-process LP or "greedy" for the NumPy heuristic
+warm_start = True  # start the MiniZinc MIP solvers from the greedy schedule
+use_cache = True  # reuse the solutions of previous runs with the same inputs
+solvers = ["mip"]  # MiniZinc solvers, several of them race each other, e.g. ["coin-bc", "highs", "gecode"]
+time_limit = None  # seconds per solve, None for no limit
+mip_gap = None  # relative gap at which a MIP solution is accepted, None for optimality
 
 # tariffs or prices-related parameters
 network_tariffs_peak = [0, 15, 15, 15, 0]
 network_tariffs_off_peak = [0, 15, 3, 0, 15]
 network_tariffs_peak = [15]
 network_tariffs_off_peak = [3]
+use_existing_load = True
+use_wholesale_prices = True
+
+# execution-related parameters
+num_workers = None  # number of solver processes, None for one per CPU
+trace = False  # record the wall time of each stage in a JSONL trace
+trace_memory = False  # also record the peak memory of each stage, which slows down every allocation
+save_schedules = True  # keep the solutions in a compressed result store next to the plots
+plot_mode = "scalable"  # "scalable" for datetime axes, shared data and decimation, or "detailed"
+max_plot_points = 4000  # points per line in the scalable mode
+
+
+def main(args):
+    run_name = f"results/{now_datetime}-existing-{args.use_existing_load}-price-{args.use_wholesale_prices}"
+    trace_file = f"{run_name}-trace.jsonl" if args.trace or args.trace_memory else None
+    profiling.start_trace(trace_file, args.trace_memory, truncate=True)
+
+    # the months are read from the store one at a time, and a month is released once it has been stored and plotted
+    months_year = input.iter_months(args.start_time_day, args.end_time_day,
+                                    args.file_prices_data, args.file_load_data,
+                                    store_dir=args.store_dir, months=args.months)
+    months_pending = deque()
 
+    def scenarios():
+        # prepare input parameters and one scenario per month and tariff pair
+        for month, datetimes_2d, prices_2d, loads_2d in months_year:
+            month = str(month)
+            with profiling.tags(month=month), profiling.stage("data loading"):
+                num_days, num_periods_day = prices_2d.shape
+                interval_hours = calendar.interval_hours(input.read_resolution(args.store_dir))
+                peak_periods, off_peak_periods = calendar.tariff_periods(datetimes_2d[0], args.peak_windows)
+                datetime_month = datetimes_2d.ravel()
+                prices_2d = np.array(prices_2d, dtype=float)
+                loads_2d = np.array(loads_2d, dtype=float)
 
-def main(use_existing_load, use_wholesale_prices):
-    # import input data
-    prices_year, loads_year, months_year, datetimes_year = input.read_data(start_time_day, end_time_day, )
+                if not args.use_wholesale_prices:
+                    prices_2d = np.zeros(prices_2d.shape)
 
-    # start scheduling
+                if not args.use_existing_load:
+                    loads_2d = np.zeros(loads_2d.shape)
+
+            months_pending.append((month, datetime_month, prices_2d.ravel(), loads_2d.ravel(), interval_hours))
+            for network_tariff_peak, network_tariff_off_peak in args.tariffs:
+                yield dict(num_days=num_days, num_periods_day=num_periods_day,
+                           peak_periods=peak_periods, off_peak_periods=off_peak_periods,
+                           num_evs=args.num_evs, max_charge=args.max_charge, total_energy=args.total_energy,
+                           prices_2d=prices_2d, loads_2d=loads_2d,
+                           network_tariff_peak=network_tariff_peak,
+                           network_tariff_off_peak=network_tariff_off_peak,
+                           aggregate=args.aggregate, backend=args.backend, warm_start=args.warm_start,
+                           use_cache=args.cache, solvers=args.solvers,
+                           time_limit=args.time_limit, mip_gap=args.mip_gap, interval_hours=interval_hours,
+                           trace_tags=dict(month=month, network_tariff_peak=network_tariff_peak,
+                                           network_tariff_off_peak=network_tariff_off_peak))
+
+    # start scheduling, the results come back in the order of the scenarios
+    results = runner.iter_scenarios(scenarios(), num_workers=args.num_workers,
+                                    trace_file=trace_file, trace_memory=args.trace_memory)
     tab_year = []
-    for month, datetime_month, prices_month, loads_month in zip(months_year, datetimes_year, prices_year, loads_year):
-
-        # prepare input parameters
-        month = month.strftime("%Y-%m")
-        num_days = len(set([x.strftime("%Y-%m-%d") for x in datetime_month]))
-        num_periods = len(prices_month)
-        prices_2d = input.reshape_data(prices_month, num_days, num_periods_day)
-        loads_2d = input.reshape_data(loads_month, num_days, num_periods_day)
-
-        if not use_wholesale_prices:
-            prices_month = [0 for _ in range(num_periods)]
-            prices_2d = [[0 for _ in range(num_periods_day)] for _ in range(num_days)]
-
-        if not use_existing_load:
-            loads_month = [0 for _ in range(num_periods)]
-            loads_2d = [[0 for _ in range(num_periods_day)] for _ in range(num_days)]
-
-        layout_month = []
-        for network_tariff_peak, network_tariff_off_peak in zip(network_tariffs_peak, network_tariffs_off_peak):
-            # start scheduling
-            charge_ev_day_period, minizinc_outputs \
-                = ev.schedule_evs(num_days, num_periods_day, peak_periods, off_peak_periods, num_evs,
-                                  max_charge, total_energy, prices_2d, loads_2d,
-                                  network_tariff_peak, network_tariff_off_peak)
-            max_demand_peak = minizinc_outputs["max_demand_peak"]
-            max_demand_off_peak = minizinc_outputs["max_demand_off_peak"]
-            print(f"{month} scheduled in {minizinc_outputs['time (ms)']}.")
-
-            # merge result data together
+    results_month = []
+    num_not_scheduled = 0
+    for charge_ev_day_period, minizinc_outputs in results:
+        month_data = months_pending[0]
+        tariffs = args.tariffs[len(results_month)]
+        # a scenario without a schedule is reported and left out of the store and the plots
+        if charge_ev_day_period is None:
+            print(f"{month_data[0]} with network tariffs {tariffs} not scheduled: {minizinc_outputs['error'][0]}")
+            num_not_scheduled += 1
+        else:
+            print(f"{month_data[0]} scheduled in {minizinc_outputs['time (ms)']}.")
+            if args.save_schedules:
+                store.save_month(run_name, month_data[0], *tariffs, charge_ev_day_period, minizinc_outputs,
+                                 num_evs=args.num_evs, aggregate=args.aggregate)
+        results_month.append((tariffs, charge_ev_day_period, minizinc_outputs))
+
+        # a headless run stops at the result store and never loads Bokeh
+        if len(results_month) == len(args.tariffs):
+            months_pending.popleft()
+            results_scheduled = [result for result in results_month if result[1] is not None]
+            if not args.headless and results_scheduled:
+                tab_year.append(render_month(args, *month_data, results_scheduled))
+            results_month = []
+
+    if not args.headless and tab_year:
+        save_plots(args, run_name, tab_year)
+    if num_not_scheduled:
+        print(f"{num_not_scheduled} scenarios were not scheduled.")
+    if trace_file is not None:
+        print(profiling.format_summary(profiling.summarise(trace_file)))
+    print("Done.")
+
+
+def render_month(args, month, datetime_month, prices_month, loads_month, interval_hours, results_month):
+    from bokeh.layouts import layout
+    from bokeh.models import Panel
+    import scripts.output_data as output
+
+    layout_month = []
+    figure_titles = []
+    merged_data_dicts = []
+    minizinc_outputs_list = []
+    for (network_tariff_peak, network_tariff_off_peak), charge_ev_day_period, minizinc_outputs in results_month:
+        max_demand_peak = minizinc_outputs["max_demand_peak"]
+        max_demand_off_peak = minizinc_outputs["max_demand_off_peak"]
+
+        # merge result data together
+        trace_tags = dict(month=month, network_tariff_peak=network_tariff_peak,
+                          network_tariff_off_peak=network_tariff_off_peak)
+        with profiling.tags(**trace_tags), profiling.stage("post-processing"):
             merged_data_dict \
                 = output.merge_results(charge_ev_day_period, loads_month, prices_month, datetime_month,
-                                       max_demand_peak, max_demand_off_peak)
-
-            # plot monthly charge profile, the existing demand profile, the total demand profile and the prices
-            figure_title = f"{month}: peak network tariff = {network_tariff_peak} $/kW, " \
-                           f"off peak network tariff = {network_tariff_off_peak} $/kW, " \
-                           f"use existing load = {use_existing_load}, " \
-                           f"use wholesale prices = {use_wholesale_prices}"
-            p_month, data_table \
-                = output.visualise_monthly_results(figure_title, datetime_month,
-                                                   merged_data_dict, prices_month, minizinc_outputs)
+                                       max_demand_peak, max_demand_off_peak,
+                                       interval_hours=interval_hours, peak_windows=args.peak_windows)
+
+        # plot monthly charge profile, the existing demand profile, the total demand profile and the prices
+        figure_title = f"{month}: peak network tariff = {network_tariff_peak} $/kW, " \
+                       f"off peak network tariff = {network_tariff_off_peak} $/kW, " \
+                       f"use existing load = {args.use_existing_load}, " \
+                       f"use wholesale prices = {args.use_wholesale_prices}"
+        if args.plot_mode == "detailed":
+            # the period labels are built from the datetimes as Python objects
+            with profiling.tags(**trace_tags), profiling.stage("plotting"):
+                p_month, data_table \
+                    = output.visualise_monthly_results(figure_title,
+                                                       datetime_month.astype("datetime64[s]").astype(object),
+                                                       merged_data_dict, prices_month, minizinc_outputs)
             layout_month.extend([p_month, data_table])
+        else:
+            figure_titles.append(figure_title)
+            merged_data_dicts.append(merged_data_dict)
+            minizinc_outputs_list.append(minizinc_outputs)
+
+    # all the tariff variants of the month are drawn from one shared and decimated data source
+    if args.plot_mode == "scalable":
+        with profiling.tags(month=month), profiling.stage("plotting"):
+            layout_month = output.visualise_monthly_results_scalable(figure_titles, datetime_month,
+                                                                     merged_data_dicts, prices_month,
+                                                                     minizinc_outputs_list,
+                                                                     max_points=args.max_plot_points)
 
-        tab = Panel(child=layout(layout_month, sizing_mode='scale_width'), title=month)
-        tab_year.append(tab)
+    return Panel(child=layout(layout_month, sizing_mode='scale_width'), title=month)
+
+
+def save_plots(args, run_name, tab_year):
+    from bokeh.layouts import layout, row
+    from bokeh.models import Tabs
+    from bokeh.plotting import output_file, save, show
 
-    # save plots
     print("Saving plots...")
-    output_file(f"results/{now_datetime}-existing-{use_existing_load}-price-{use_wholesale_prices}-year.html")
-    output_graph = layout(row(Tabs(tabs=tab_year)), sizing_mode="scale_width")
-    save(output_graph)
-    show(output_graph)
-    print("Done.")
+    output_file(f"{run_name}-year.html")
+    with profiling.stage("saving"):
+        output_graph = layout(row(Tabs(tabs=tab_year)), sizing_mode="scale_width")
+        save(output_graph)
+    if args.show:
+        show(output_graph)
 
 
-if __name__ == '__main__':
+def tariff_pair(text):
+    # "PEAK:OFF_PEAK" in $/kW, e.g. "15:3"
+    try:
+        network_tariff_peak, network_tariff_off_peak = text.split(":")
+        return float(network_tariff_peak), float(network_tariff_off_peak)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a tariff pair as PEAK:OFF_PEAK, got {text!r}")
+
+
+def time_window(text):
+    # "START-END" times of the day, e.g. "16:00-22:00"
+    try:
+        start_time, end_time = text.split("-")
+        calendar.minutes_of_day(start_time), calendar.minutes_of_day(end_time)
+        return start_time, end_time
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a time window as START-END, got {text!r}")
+
 
-    for use_existing_load in [True]:
-        for use_wholesale_prices in [True]:
-            main(use_existing_load, use_wholesale_prices)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Schedule the charging of an EV fleet month by month "
+                                                 "and plot the demand profiles.")
+    parser.add_argument("--file-prices-data", default=file_prices_data)
+    parser.add_argument("--file-load-data", default=file_load_data)
+    parser.add_argument("--store-dir", default=store_dir, help="binary store the CSV files are converted to")
+    parser.add_argument("--start-time-day", default=start_time_day, help="start time of the daily window")
+    parser.add_argument("--end-time-day", default=end_time_day, help="start time of the last period of the window")
+    parser.add_argument("--peak-windows", nargs="+", type=time_window, default=peak_windows,
+                        help="daily windows of the peak network tariff as START-END, e.g. 7:00-9:00 16:00-22:00")
+    parser.add_argument("--months", nargs="+", default=None, help="months to schedule, e.g. 2019-03, default all")
+    parser.add_argument("--tariffs", nargs="+", type=tariff_pair,
+                        default=list(zip(network_tariffs_peak, network_tariffs_off_peak)),
+                        help="network tariff pairs in $/kW as PEAK:OFF_PEAK, e.g. 15:3 0:15")
+    parser.add_argument("--num-evs", type=int, default=num_evs)
+    parser.add_argument("--max-charge", type=float, default=max_charge, help="charger power of an EV in kW")
+    parser.add_argument("--total-energy", type=float, default=total_energy, help="daily energy of an EV in kWh")
+    parser.add_argument("--existing-load", dest="use_existing_load", action=argparse.BooleanOptionalAction,
+                        default=use_existing_load)
+    parser.add_argument("--wholesale-prices", dest="use_wholesale_prices", action=argparse.BooleanOptionalAction,
+                        default=use_wholesale_prices)
+    parser.add_argument("--aggregate", action=argparse.BooleanOptionalAction, default=aggregate_evs,
+                        help="solve one fleet charge per period instead of one per EV")
+    parser.add_argument("--backend", choices=["minizinc", "highs", "greedy"], default=backend)
+    parser.add_argument("--warm-start", action=argparse.BooleanOptionalAction, default=warm_start)
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=use_cache)
+    parser.add_argument("--solvers", nargs="+", default=solvers)
+    parser.add_argument("--time-limit", type=float, default=time_limit, help="seconds per solve")
+    parser.add_argument("--mip-gap", type=float, default=mip_gap)
+    parser.add_argument("--num-workers", type=int, default=num_workers, help="solver processes, default one per CPU")
+    parser.add_argument("--trace", action=argparse.BooleanOptionalAction, default=trace)
+    parser.add_argument("--trace-memory", action=argparse.BooleanOptionalAction, default=trace_memory,
+                        help="also trace the peak memory of each stage with tracemalloc, slower")
+    parser.add_argument("--save-schedules", action=argparse.BooleanOptionalAction, default=save_schedules)
+    parser.add_argument("--headless", action="store_true",
+                        help="only schedule and store the results, without loading Bokeh or plotting")
+    parser.add_argument("--plot-mode", choices=["scalable", "detailed"], default=plot_mode)
+    parser.add_argument("--max-plot-points", type=int, default=max_plot_points)
+    parser.add_argument("--show", action=argparse.BooleanOptionalAction, default=True,
+                        help="open the saved plots in a browser")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,43 @@
+import numpy as np
+
+# an EV is a dict of its daily arrival period, departure period (exclusive, both from 0),
+# charger power (kW) and daily energy need (kWh)
+ev_keys = ("arrival", "departure", "max_charge", "total_energy")
+
+
+def group_ev_classes(evs):
+    # EVs with identical parameters form one class that is scheduled as a single unit
+    ev_classes = []
+    class_indices = {}
+    class_of_ev = []
+    for ev in evs:
+        key = tuple(ev[k] for k in ev_keys)
+        if key not in class_indices:
+            class_indices[key] = len(ev_classes)
+            ev_classes.append(dict(zip(ev_keys, key), count=0))
+        ev_classes[class_indices[key]]["count"] += 1
+        class_of_ev.append(class_indices[key])
+    return ev_classes, np.array(class_of_ev, dtype=int)
+
+
+def check_ev_classes(ev_classes, num_periods_day, interval_hours=0.5):
+    for ev_class in ev_classes:
+        if not 0 <= ev_class["arrival"] < ev_class["departure"] <= num_periods_day:
+            raise ValueError(f"Invalid arrival and departure periods: {ev_class}")
+        hours_plugged_in = (ev_class["departure"] - ev_class["arrival"]) * interval_hours
+        if ev_class["total_energy"] > ev_class["max_charge"] * hours_plugged_in:
+            raise ValueError(f"The energy cannot be charged between arrival and departure: {ev_class}")
+
+
+def availability_classes(ev_classes, num_periods_day):
+    # (classes, periods) mask of the periods each class is plugged in
+    periods = np.arange(num_periods_day)
+    return np.array([(ev_class["arrival"] <= periods) & (periods < ev_class["departure"])
+                     for ev_class in ev_classes])
+
+
+def disaggregate_class_charges(charge_class_day_period, ev_classes, class_of_ev):
+    # EVs of the same class share the class charge equally
+    counts = np.array([ev_class["count"] for ev_class in ev_classes], dtype=float)
+    charge_class_day_period = np.asarray(charge_class_day_period, dtype=float) / counts[:, None, None]
+    return charge_class_day_period[class_of_ev]
@@ -0,0 +1,125 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import linprog
+from time import perf_counter
+import scripts.ev_scheduling_lp as lp
+
+
+def solve_day(task):
+    # wholesale cost of one day when the demand above each cap is charged a penalty per kW,
+    # and the slope of that cost in each cap; the penalty makes every day feasible for any caps
+    (c, a_ub, b_ub, a_eq, b_eq, bounds, constant_cost), caps, penalty = task
+    c = c.copy()
+    bounds = bounds.copy()
+    # the max demand variables are at least the caps and cost the penalty, so the cost above a cap is
+    # penalty * max(demand - cap, 0); a demand variable of an empty period set stays fixed at 0
+    is_capped = np.isinf(bounds[-2:, 1])
+    c[-2:] = np.where(is_capped, penalty, 0)
+    bounds[-2:, 0] = np.where(is_capped, caps, 0)
+    result = linprog(c, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq, bounds=bounds, method="highs")
+    if result.status != 0:
+        raise RuntimeError(f"HiGHS failed to solve the EV scheduling day LP: {result.message}")
+    cost = result.fun + constant_cost - penalty * float(np.sum(np.where(is_capped, caps, 0)))
+    slopes = np.where(is_capped, result.lower.marginals[-2:] - penalty, 0)
+    return cost, slopes, result.x[:-2]
+
+
+def schedule_evs_decomposed(num_days, num_periods_day, peak_periods, off_peak_periods,
+                            num_evs, max_charge, total_energy,
+                            prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                            aggregate=False, num_workers=1, tolerance=1e-6, max_iterations=200,
+                            interval_hours=0.5):
+
+    off_peak_periods2 = set(off_peak_periods)
+    if network_tariff_peak == network_tariff_off_peak:
+        peak_periods2 = set(range(num_periods_day))
+        network_tariff_off_peak = 0
+    else:
+        peak_periods2 = set(peak_periods)
+    peak_periods2 = sorted(peak_periods2)
+    off_peak_periods2 = sorted(off_peak_periods2)
+
+    if aggregate:
+        max_charge_units = [num_evs * max_charge]
+        total_energy_units = [num_evs * total_energy]
+    else:
+        max_charge_units = [max_charge] * num_evs
+        total_energy_units = [total_energy] * num_evs
+    prices_2d = np.asarray(prices_2d, dtype=float)
+    loads_2d = np.asarray(loads_2d, dtype=float)
+    tariffs = np.array([network_tariff_peak, network_tariff_off_peak], dtype=float)
+
+    # the caps never need to go below the existing demand or above the existing demand plus a full fleet charge;
+    # a cap whose tariff is not positive stays at its upper bound
+    demand_2d = loads_2d / interval_hours
+    bounds_caps = np.zeros((2, 2))
+    for i, periods in enumerate((peak_periods2, off_peak_periods2)):
+        if periods:
+            bounds_caps[i] = [demand_2d[:, periods].max(), demand_2d[:, periods].max() + sum(max_charge_units)]
+        if tariffs[i] <= 0:
+            bounds_caps[i, 0] = bounds_caps[i, 1]
+
+    # the penalty is above any tariff, so it is never cheaper to exceed a cap than to raise it
+    penalty = 2 * max(tariffs.max(), 0) + 1
+    day_lps = [lp.build_lp(1, num_periods_day, peak_periods2, off_peak_periods2,
+                           max_charge_units, total_energy_units, [prices_day], [loads_day], 0, 0,
+                           interval_hours=interval_hours)
+               for prices_day, loads_day in zip(prices_2d, loads_2d)]
+
+    # the days are only linked through the caps, so they are solved independently,
+    # in a pool only when asked for, since a day LP is usually quicker than sending it to a worker
+    pool = ProcessPoolExecutor(max_workers=num_workers) if num_workers is None or num_workers > 1 else None
+    map_days = pool.map if pool is not None else map
+
+    def evaluate(caps):
+        days = list(map_days(solve_day, [(day_lp, caps, penalty) for day_lp in day_lps]))
+        cost = sum(day[0] for day in days)
+        slopes = np.sum([day[1] for day in days], axis=0)
+        return cost + tariffs @ caps, cost, slopes, days
+
+    start_time = perf_counter()
+    try:
+        # Kelley's cutting planes over both caps at once: the master LP over (cap_peak, cap_off_peak, cost)
+        # minimises the tariffs plus the largest linearisation of the days' cost; the cost is non-increasing
+        # in the caps, so its value at the upper caps is a lower bound
+        caps = bounds_caps[:, 1].copy()
+        objective, cost, slopes, days = evaluate(caps)
+        best = (objective, caps, days)
+        cuts_a = [np.append(slopes, -1)]
+        cuts_b = [slopes @ caps - cost]
+        master_bounds = list(map(tuple, bounds_caps)) + [(cost, None)]
+        for _ in range(max_iterations):
+            master = linprog(np.append(tariffs, 1), A_ub=np.array(cuts_a), b_ub=np.array(cuts_b),
+                             bounds=master_bounds, method="highs")
+            if master.status != 0:
+                raise RuntimeError(f"HiGHS failed to solve the cap master LP: {master.message}")
+            if best[0] - master.fun <= tolerance * max(1, abs(best[0])):
+                break
+            caps = np.clip(master.x[:2], bounds_caps[:, 0], bounds_caps[:, 1])
+            objective, cost, slopes, days = evaluate(caps)
+            if objective < best[0]:
+                best = (objective, caps, days)
+            cuts_a.append(np.append(slopes, -1))
+            cuts_b.append(slopes @ caps - cost)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    solve_time = perf_counter() - start_time
+    days = best[2]
+
+    # organise results in the same structure as the other backends
+    charge_ev_day_period = np.stack([day[2].reshape((len(max_charge_units), num_periods_day)) for day in days],
+                                    axis=1)
+    total_demand_2d = charge_ev_day_period.sum(axis=0) + demand_2d
+    max_demand_peak = float(total_demand_2d[:, peak_periods2].max()) if peak_periods2 else 0
+    max_demand_off_peak = float(total_demand_2d[:, off_peak_periods2].max()) if off_peak_periods2 else 0
+    wholesale_cost = float(np.sum(0.001 * prices_2d * (charge_ev_day_period.sum(axis=0) * interval_hours + loads_2d)))
+    network_charge = network_tariff_peak * max_demand_peak + network_tariff_off_peak * max_demand_off_peak
+    minizinc_outputs = {
+        "wholesale_cost": [wholesale_cost],
+        "network_charge": [network_charge],
+        "max_demand_peak": [max_demand_peak],
+        "max_demand_off_peak": [max_demand_off_peak],
+        "time (ms)": [solve_time * 1000],
+    }
+    return charge_ev_day_period, minizinc_outputs
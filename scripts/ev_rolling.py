@@ -0,0 +1,126 @@
+import numpy as np
+from scipy.optimize import linprog
+from time import perf_counter
+import scripts.ev_scheduling_lp as lp
+
+
+def start_rolling_schedule(num_days, num_periods_day, peak_periods, off_peak_periods,
+                           num_evs, max_charge, total_energy,
+                           prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak, interval_hours=0.5):
+    # plan the whole month once; the state is then updated by reschedule_evs as the month goes on
+    off_peak_periods2 = sorted(off_peak_periods)
+    if network_tariff_peak == network_tariff_off_peak:
+        peak_periods2 = list(range(num_periods_day))
+        network_tariff_off_peak = 0
+    else:
+        peak_periods2 = sorted(peak_periods)
+
+    # the LP of the whole month is built once: a re-plan only fixes the dispatched periods through their bounds
+    # and updates the costs and the existing demands of the forecasts, so that with highspy it starts from the
+    # optimal basis of the previous plan
+    max_charge_fleet = num_evs * max_charge
+    c, a_ub, b_ub, a_eq, b_eq, bounds, constant_cost \
+        = lp.build_lp(num_days, num_periods_day, peak_periods2, off_peak_periods2,
+                      [max_charge_fleet], [num_evs * total_energy],
+                      prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                      interval_hours=interval_hours)
+    state = {
+        "num_periods_day": num_periods_day,
+        "peak_periods": peak_periods2,
+        "off_peak_periods": off_peak_periods2,
+        "num_evs": num_evs,
+        "max_charge": max_charge,
+        "total_energy": total_energy,
+        "network_tariff_peak": network_tariff_peak,
+        "network_tariff_off_peak": network_tariff_off_peak,
+        "interval_hours": interval_hours,
+        "lp": (c, a_ub, b_ub, a_eq, b_eq, bounds),
+        "highs": lp.build_highs(c, a_ub, b_ub, a_eq, b_eq, bounds) if lp.highspy is not None else None,
+        "day": 0,
+        "period": 0,
+        "charge_day_period": None,
+        "prices_2d": None,
+        "loads_2d": None,
+    }
+    return reschedule_evs(state, 0, 0, np.zeros((num_days, num_periods_day)), prices_2d, loads_2d)
+
+
+def reschedule_evs(state, day, period, dispatched_day_period, prices_2d, loads_2d):
+    # re-plan the fleet charge from (day, period) to the end of the month
+    # dispatched_day_period, prices_2d and loads_2d cover the whole month: the dispatched charges are only read
+    # before (day, period), and the prices and loads are actuals before it and forecasts after it
+    num_periods_day = state["num_periods_day"]
+    peak_periods2 = state["peak_periods"]
+    off_peak_periods2 = state["off_peak_periods"]
+    network_tariff_peak = state["network_tariff_peak"]
+    network_tariff_off_peak = state["network_tariff_off_peak"]
+    interval_hours = state["interval_hours"]
+    dispatched_day_period = np.asarray(dispatched_day_period, dtype=float)
+    prices_2d = np.array(prices_2d, dtype=float)
+    loads_2d = np.array(loads_2d, dtype=float)
+    num_days = len(prices_2d)
+    num_charges = num_days * num_periods_day
+    past = np.zeros((num_days, num_periods_day), dtype=bool)
+    past[:day] = True
+    past[day, :period] = True
+
+    # the previous plan is still optimal if it was followed and the forecasts have not changed
+    start_time = perf_counter()
+    iterations = 0
+    is_plan_current = state["charge_day_period"] is not None \
+        and np.allclose(dispatched_day_period[past], state["charge_day_period"][past]) \
+        and np.array_equal(prices_2d[~past], state["prices_2d"][~past]) \
+        and np.array_equal(loads_2d[~past], state["loads_2d"][~past])
+    if is_plan_current:
+        charge_day_period = state["charge_day_period"].copy()
+        charge_day_period[past] = dispatched_day_period[past]
+    else:
+        # the dispatched periods are fixed; the monthly peaks reached so far are kept by their max demand rows
+        c, a_ub, b_ub, a_eq, b_eq, bounds = state["lp"]
+        c_charges = (0.001 * prices_2d * interval_hours).ravel()
+        b_ub = lp.max_demand_b_ub(loads_2d, peak_periods2, off_peak_periods2, interval_hours)
+        upper = np.full(num_charges, float(state["num_evs"] * state["max_charge"]))
+        lower = np.zeros(num_charges)
+        lower[past.ravel()] = upper[past.ravel()] = dispatched_day_period[past]
+
+        highs = state["highs"]
+        if highs is not None:
+            columns = np.arange(num_charges, dtype=np.int32)
+            highs.changeColsCost(num_charges, columns, c_charges)
+            highs.changeColsBounds(num_charges, columns, lower, upper)
+            highs.changeRowsBounds(len(b_ub), np.arange(len(b_ub), dtype=np.int32),
+                                   np.full(len(b_ub), -lp.highspy.kHighsInf), b_ub)
+            highs.run()
+            if highs.getModelStatus() != lp.highspy.HighsModelStatus.kOptimal:
+                raise RuntimeError(f"HiGHS failed to solve the EV rescheduling LP: {highs.getModelStatus()}")
+            x = np.array(highs.getSolution().col_value)
+            iterations = highs.getInfo().simplex_iteration_count
+        else:
+            c = np.concatenate([c_charges, c[num_charges:]])
+            bounds = bounds.copy()
+            bounds[:num_charges, 0] = lower
+            bounds[:num_charges, 1] = upper
+            result = linprog(c, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq, bounds=bounds, method="highs")
+            if result.status != 0:
+                raise RuntimeError(f"HiGHS failed to solve the EV rescheduling LP: {result.message}")
+            x = result.x
+            iterations = result.nit
+        charge_day_period = x[:num_charges].reshape((num_days, num_periods_day))
+    solve_time = perf_counter() - start_time
+
+    # organise results for the whole month
+    total_demand_2d = charge_day_period + loads_2d / interval_hours
+    max_demand_peak = float(total_demand_2d[:, peak_periods2].max()) if peak_periods2 else 0
+    max_demand_off_peak = float(total_demand_2d[:, off_peak_periods2].max()) if off_peak_periods2 else 0
+    wholesale_cost = float(np.sum(0.001 * prices_2d * (charge_day_period * interval_hours + loads_2d)))
+    network_charge = network_tariff_peak * max_demand_peak + network_tariff_off_peak * max_demand_off_peak
+    minizinc_outputs = {
+        "wholesale_cost": [wholesale_cost],
+        "network_charge": [network_charge],
+        "max_demand_peak": [max_demand_peak],
+        "max_demand_off_peak": [max_demand_off_peak],
+        "time (ms)": [solve_time * 1000],
+    }
+    state = dict(state, day=day, period=period, charge_day_period=charge_day_period,
+                 prices_2d=prices_2d, loads_2d=loads_2d, minizinc_outputs=minizinc_outputs, iterations=iterations)
+    return state
@@ -1,11 +1,95 @@
-import minizinc as mzn
+import numpy as np
 import ast
+from datetime import timedelta
+import scripts.ev_classes as classes
+import scripts.ev_scheduling_greedy as greedy
+import scripts.profiling as profiling
+import scripts.solve_cache as cache
+
+# the backends import their solver only when they are used,
+# so that a HiGHS or greedy run neither needs MiniZinc nor waits for it to load
 
 
 def schedule_evs(num_days, num_periods_day, peak_periods, off_peak_periods,
                  num_evs, max_charge, total_energy,
                  prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
-                 model_file="scripts/ev-scheduling.mzn"):
+                 model_file="scripts/ev-scheduling.mzn",
+                 aggregate=False, disaggregate=False, fleet_model_file="scripts/ev-scheduling-fleet.mzn",
+                 backend="minizinc", warm_start=False,
+                 use_cache=False, cache_dir="cache", cache_max_size=1024 ** 3,
+                 solvers=("mip",), time_limit=None, mip_gap=None, interval_hours=0.5):
+
+    if backend == "minizinc":
+        model_file = fleet_model_file if aggregate else model_file
+    elif backend == "highs":
+        import scripts.ev_scheduling_lp as lp
+        model_file = lp.__file__
+    elif backend == "greedy":
+        model_file = greedy.__file__
+    else:
+        raise ValueError(f"Unknown scheduling backend: {backend}")
+
+    # look up the solution of the same model and inputs;
+    # the solvers, the time limit and the gap only apply to the MiniZinc backend, so only its key holds them
+    result = None
+    if use_cache:
+        solve_settings = dict(solvers=list(solvers), time_limit=time_limit, mip_gap=mip_gap) \
+            if backend == "minizinc" else {}
+        key = cache.make_key(model_file, num_days, num_periods_day, peak_periods, off_peak_periods,
+                             num_evs, max_charge, total_energy,
+                             prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                             aggregate=aggregate, backend=backend, interval_hours=interval_hours, **solve_settings)
+        with profiling.stage("cache lookup") as record:
+            result = cache.load_result(key, cache_dir)
+            record["hit"] = result is not None
+
+    if result is None:
+        # the HiGHS backend builds the same model as sparse matrices and solves it in process
+        if backend == "highs":
+            result = lp.schedule_evs_lp(num_days, num_periods_day, peak_periods, off_peak_periods,
+                                        num_evs, max_charge, total_energy,
+                                        prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                                        aggregate=aggregate, interval_hours=interval_hours)
+        # the greedy backend is exact for identical EVs up to the tolerance of its peak demand search
+        elif backend == "greedy":
+            result = greedy.schedule_evs_greedy(num_days, num_periods_day, peak_periods, off_peak_periods,
+                                                num_evs, max_charge, total_energy,
+                                                prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                                                aggregate=aggregate, interval_hours=interval_hours)
+        else:
+            # the greedy schedule is a feasible solution that the MIP solvers can start from
+            start_charge_day_period = None
+            if warm_start:
+                start_charge_day_period = greedy.schedule_evs_greedy(num_days, num_periods_day, peak_periods,
+                                                                     off_peak_periods, num_evs, max_charge,
+                                                                     total_energy, prices_2d, loads_2d,
+                                                                     network_tariff_peak, network_tariff_off_peak,
+                                                                     aggregate=True,
+                                                                     interval_hours=interval_hours)[0][0]
+            result = schedule_evs_minizinc(num_days, num_periods_day, peak_periods, off_peak_periods,
+                                           num_evs, max_charge, total_energy,
+                                           prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                                           model_file, aggregate, start_charge_day_period=start_charge_day_period,
+                                           solvers=solvers, time_limit=time_limit, mip_gap=mip_gap,
+                                           interval_hours=interval_hours)
+        if use_cache:
+            cache.save_result(key, cache_dir, *result, max_size=cache_max_size)
+
+    # the fleet schedule is returned as a single "EV" so that it can be merged as is,
+    # unless the caller asks for the per-EV schedules
+    charge_ev_day_period, minizinc_outputs = result
+    if aggregate and disaggregate:
+        charge_ev_day_period = disaggregate_charges(charge_ev_day_period[0], num_evs)
+    return charge_ev_day_period, minizinc_outputs
+
+
+def schedule_evs_minizinc(num_days, num_periods_day, peak_periods, off_peak_periods,
+                          num_evs, max_charge, total_energy,
+                          prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                          model_file, aggregate, start_charge_day_period=None,
+                          solvers=("mip",), time_limit=None, mip_gap=None, interval_hours=0.5):
+    import minizinc as mzn
+    import scripts.solve_policy as policy
 
     off_peak_periods2 = {i + 1 for i in off_peak_periods}.copy()
     if network_tariff_peak == network_tariff_off_peak:
@@ -15,25 +99,140 @@ def schedule_evs(num_days, num_periods_day, peak_periods, off_peak_periods,
         # minizinc index starts from 1
         peak_periods2 = {i + 1 for i in peak_periods}.copy()
 
+    # the data is set on one instance per solver
+    def set_data(ins):
+        ins["num_days"] = num_days
+        ins["num_periods_day"] = num_periods_day
+        ins["interval_hours"] = interval_hours
+        ins["PEAK_PERIODS"] = peak_periods2
+        ins["OFF_PEAK_PERIODS"] = off_peak_periods2
+        ins["num_evs"] = num_evs
+        ins["max_charge"] = max_charge
+        ins["total_energy"] = total_energy
+        ins["wholesale_prices"] = np.asarray(prices_2d, dtype=float).tolist()
+        ins["network_tariff_peak"] = network_tariff_peak
+        ins["network_tariff_off_peak"] = network_tariff_off_peak
+        ins["existing_loads"] = np.asarray(loads_2d, dtype=float).tolist()
+        if start_charge_day_period is not None:
+            # the fleet charge is shared equally by the EVs of the per-EV model
+            start_charge = np.asarray(start_charge_day_period, dtype=float)
+            if not aggregate:
+                start_charge = disaggregate_charges(start_charge, num_evs)
+            ins[f"{charge_variable}_start"] = start_charge.ravel().tolist()
+
     # build a MiniZinc model
-    model = mzn.Model(model_file)
-    solver = mzn.Solver.lookup("mip")
-    ins = mzn.Instance(solver, model)
-    ins["num_days"] = num_days
-    ins["num_periods_day"] = num_periods_day
-    ins["PEAK_PERIODS"] = peak_periods2
-    ins["OFF_PEAK_PERIODS"] = off_peak_periods2
-    ins["num_evs"] = num_evs
-    ins["max_charge"] = max_charge
-    ins["total_energy"] = total_energy
-    ins["wholesale_prices"] = prices_2d
-    ins["network_tariff_peak"] = network_tariff_peak
-    ins["network_tariff_off_peak"] = network_tariff_off_peak
-    ins["existing_loads"] = loads_2d
-    result = ins.solve()
+    # the fleet model has one charge variable per (day, period) for all the identical EVs together
+    charge_variable = "charge_fleet" if aggregate else "charge_strategy"
+    with profiling.stage("model build", backend="minizinc"):
+        if start_charge_day_period is None:
+            model = mzn.Model(model_file)
+        else:
+            model = warm_start_model(mzn, model_file, charge_variable)
+
+    # flattening and solving happen in the same MiniZinc call, the statistics split them
+    with profiling.stage("flatten and solve", backend="minizinc", solvers=list(solvers)) as record:
+        with profiling.solver_memory(record):
+            result = policy.solve(model, set_data, solvers, time_limit, mip_gap)
+        record.update(result.statistics)
+        record["status"] = str(result.status)
+        record["gap"] = policy.relative_gap(result)
 
     # organise results
-    charge_ev_day_period = result.solution.charge_strategy
+    if aggregate:
+        charge_ev_day_period = [result.solution.charge_fleet]
+    else:
+        charge_ev_day_period = result.solution.charge_strategy
     minizinc_outputs = ast.literal_eval(result.solution._output_item)
-    minizinc_outputs["time (ms)"] = [result.statistics['solveTime'].microseconds * 0.001]
+    minizinc_outputs["time (ms)"] = [result.statistics.get('solveTime', timedelta(0)).total_seconds() * 1000]
     return charge_ev_day_period, minizinc_outputs
+
+
+def warm_start_model(mzn, model_file, charge_variable):
+    # the model with a warm_start annotation on its solve item, which the MIP solvers that support it
+    # (e.g. Gurobi, CPLEX, SCIP, COIN-BC) take as a starting solution and the others ignore;
+    # the start values are the data <charge_variable>_start, in the order of array1d(<charge_variable>)
+    with open(model_file) as f:
+        model_text = f.read()
+    solve_item = "solve minimize objective;"
+    if solve_item not in model_text:
+        raise ValueError(f"No '{solve_item}' item to annotate in {model_file}")
+    model = mzn.Model()
+    model.add_string(model_text.replace(
+        solve_item,
+        f"array[int] of float: {charge_variable}_start;\n"
+        f"solve :: warm_start(array1d({charge_variable}), {charge_variable}_start) minimize objective;"))
+    return model
+
+
+def schedule_ev_classes(num_days, num_periods_day, peak_periods, off_peak_periods, evs,
+                        prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                        model_file="scripts/ev-scheduling-classes.mzn", backend="minizinc", disaggregate=False,
+                        solvers=("mip",), time_limit=None, mip_gap=None, interval_hours=0.5):
+
+    # EVs with identical arrival, departure, charger power and energy need are scheduled as one class,
+    # so the model grows with the number of distinct profiles rather than the number of EVs
+    ev_classes, class_of_ev = classes.group_ev_classes(evs)
+    classes.check_ev_classes(ev_classes, num_periods_day, interval_hours)
+    counts = np.array([ev_class["count"] for ev_class in ev_classes])
+    max_charge_classes = counts * np.array([ev_class["max_charge"] for ev_class in ev_classes])
+    total_energy_classes = counts * np.array([ev_class["total_energy"] for ev_class in ev_classes])
+
+    if backend == "highs":
+        import scripts.ev_scheduling_lp as lp
+        charge_class_day_period, minizinc_outputs \
+            = lp.schedule_units_lp(num_days, num_periods_day, peak_periods, off_peak_periods,
+                                   max_charge_classes, total_energy_classes,
+                                   prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                                   availability_units=classes.availability_classes(ev_classes, num_periods_day),
+                                   interval_hours=interval_hours)
+    elif backend == "minizinc":
+        import minizinc as mzn
+        import scripts.solve_policy as policy
+        off_peak_periods2 = {i + 1 for i in off_peak_periods}
+        if network_tariff_peak == network_tariff_off_peak:
+            peak_periods2 = {i + 1 for i in range(num_periods_day)}
+            network_tariff_off_peak = 0
+        else:
+            # minizinc index starts from 1
+            peak_periods2 = {i + 1 for i in peak_periods}
+
+        def set_data(ins):
+            ins["num_days"] = num_days
+            ins["num_periods_day"] = num_periods_day
+            ins["interval_hours"] = interval_hours
+            ins["PEAK_PERIODS"] = peak_periods2
+            ins["OFF_PEAK_PERIODS"] = off_peak_periods2
+            ins["num_classes"] = len(ev_classes)
+            ins["class_count"] = counts.tolist()
+            ins["class_arrival"] = [ev_class["arrival"] + 1 for ev_class in ev_classes]
+            ins["class_departure"] = [ev_class["departure"] + 1 for ev_class in ev_classes]
+            ins["class_max_charge"] = [float(ev_class["max_charge"]) for ev_class in ev_classes]
+            ins["class_total_energy"] = [float(ev_class["total_energy"]) for ev_class in ev_classes]
+            ins["wholesale_prices"] = np.asarray(prices_2d, dtype=float).tolist()
+            ins["network_tariff_peak"] = network_tariff_peak
+            ins["network_tariff_off_peak"] = network_tariff_off_peak
+            ins["existing_loads"] = np.asarray(loads_2d, dtype=float).tolist()
+
+        with profiling.stage("model build", backend="minizinc"):
+            model = mzn.Model(model_file)
+        with profiling.stage("flatten and solve", backend="minizinc", solvers=list(solvers)) as record:
+            result = policy.solve(model, set_data, solvers, time_limit, mip_gap)
+            record.update(result.statistics)
+            record["status"] = str(result.status)
+        charge_class_day_period = np.asarray(result.solution.charge_class, dtype=float)
+        minizinc_outputs = ast.literal_eval(result.solution._output_item)
+        minizinc_outputs["time (ms)"] = [result.statistics.get('solveTime', timedelta(0)).total_seconds() * 1000]
+    else:
+        raise ValueError(f"Unknown scheduling backend: {backend}")
+
+    # the class schedules merge as they are, or are split into per-EV schedules on request
+    if disaggregate:
+        return classes.disaggregate_class_charges(charge_class_day_period, ev_classes, class_of_ev), minizinc_outputs
+    return charge_class_day_period, minizinc_outputs
+
+
+def disaggregate_charges(charge_fleet_day_period, num_evs):
+    # identical EVs can share the fleet charge equally:
+    # each share is within max_charge and meets total_energy because the fleet bounds are num_evs times larger
+    charge_ev_day_period = np.asarray(charge_fleet_day_period, dtype=float) / num_evs
+    return np.repeat(charge_ev_day_period[None, :, :], num_evs, axis=0)
@@ -0,0 +1,117 @@
+import numpy as np
+from time import perf_counter
+import scripts.profiling as profiling
+
+
+def fill_cheapest(order, limits_2d, energy_day, interval_hours=0.5):
+    # charge in the cheapest periods of each day first (order is the argsort of the prices of each day),
+    # up to each period's limit, until the energy is met
+    # returns None if a day cannot meet the energy within the limits
+    limits_sorted = np.take_along_axis(limits_2d, order, axis=1)
+    energy_before = np.cumsum(limits_sorted * interval_hours, axis=1) - limits_sorted * interval_hours
+    if np.any(energy_before[:, -1] + limits_sorted[:, -1] * interval_hours < energy_day * (1 - 1e-9)):
+        return None
+    charges_sorted = np.clip((energy_day - energy_before) / interval_hours, 0, limits_sorted)
+    charges_2d = np.empty_like(charges_sorted)
+    np.put_along_axis(charges_2d, order, charges_sorted, axis=1)
+    return charges_2d
+
+
+def minimise(lower, upper, objective, tolerance):
+    # golden section search of a convex function that is infinite below its feasible interval
+    ratio = (np.sqrt(5) - 1) / 2
+    middle1 = upper - ratio * (upper - lower)
+    middle2 = lower + ratio * (upper - lower)
+    objective1 = objective(middle1)
+    objective2 = objective(middle2)
+    while upper - lower > tolerance:
+        if objective1 == np.inf or objective1 > objective2:
+            lower, middle1, objective1 = middle1, middle2, objective2
+            middle2 = lower + ratio * (upper - lower)
+            objective2 = objective(middle2)
+        else:
+            upper, middle2, objective2 = middle2, middle1, objective1
+            middle1 = upper - ratio * (upper - lower)
+            objective1 = objective(middle1)
+    return upper
+
+
+def schedule_evs_greedy(num_days, num_periods_day, peak_periods, off_peak_periods,
+                        num_evs, max_charge, total_energy,
+                        prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                        aggregate=False, tolerance=0.01, interval_hours=0.5):
+
+    off_peak_periods2 = set(off_peak_periods)
+    if network_tariff_peak == network_tariff_off_peak:
+        peak_periods2 = set(range(num_periods_day))
+        network_tariff_off_peak = 0
+    else:
+        peak_periods2 = set(peak_periods)
+    peak_periods2 = sorted(peak_periods2)
+    off_peak_periods2 = sorted(off_peak_periods2)
+
+    start_time = perf_counter()
+    prices_2d = np.asarray(prices_2d, dtype=float)
+    demand_2d = np.asarray(loads_2d, dtype=float) / interval_hours
+    max_charge_fleet = num_evs * max_charge
+    energy_fleet = num_evs * total_energy
+    in_peak = np.isin(np.arange(num_periods_day), peak_periods2)
+    in_off_peak = np.isin(np.arange(num_periods_day), off_peak_periods2)
+    order = np.argsort(prices_2d, axis=1, kind="stable")
+
+    def schedule(cap_peak, cap_off_peak):
+        # with the peak demands capped the days are independent and filling the cheapest periods is optimal
+        limits_2d = np.full(demand_2d.shape, float(max_charge_fleet))
+        limits_2d[:, in_peak] = np.minimum(limits_2d[:, in_peak], cap_peak - demand_2d[:, in_peak])
+        limits_2d[:, in_off_peak] = np.minimum(limits_2d[:, in_off_peak], cap_off_peak - demand_2d[:, in_off_peak])
+        if np.any(limits_2d < 0):
+            return None
+        return fill_cheapest(order, limits_2d, energy_fleet, interval_hours)
+
+    def cost(cap_peak, cap_off_peak):
+        charges_2d = schedule(cap_peak, cap_off_peak)
+        if charges_2d is None:
+            return np.inf
+        return np.sum(0.001 * prices_2d * charges_2d * interval_hours) \
+            + network_tariff_peak * cap_peak + network_tariff_off_peak * cap_off_peak
+
+    # the caps never need to go below the existing demand or above the existing demand plus a full fleet charge
+    bounds_peak = (demand_2d[:, in_peak].max(), demand_2d[:, in_peak].max() + max_charge_fleet) \
+        if peak_periods2 else (0, 0)
+    bounds_off_peak = (demand_2d[:, in_off_peak].max(), demand_2d[:, in_off_peak].max() + max_charge_fleet) \
+        if off_peak_periods2 else (0, 0)
+
+    # water-fill around the existing load: search the caps, the off peak one nested in the peak one
+    def best_cap_off_peak(cap_peak):
+        if network_tariff_off_peak <= 0:
+            return bounds_off_peak[1]
+        return minimise(*bounds_off_peak, lambda cap: cost(cap_peak, cap), tolerance)
+
+    with profiling.stage("solve", backend="greedy"):
+        if network_tariff_peak <= 0:
+            cap_peak = bounds_peak[1]
+        else:
+            cap_peak = minimise(*bounds_peak, lambda cap: cost(cap, best_cap_off_peak(cap)), tolerance)
+        charges_2d = schedule(cap_peak, best_cap_off_peak(cap_peak))
+    if charges_2d is None:
+        raise RuntimeError("The EV scheduling problem is infeasible.")
+    solve_time = perf_counter() - start_time
+
+    # organise results in the same structure as the other backends
+    if aggregate:
+        charge_ev_day_period = charges_2d[None, :, :]
+    else:
+        charge_ev_day_period = np.repeat(charges_2d[None, :, :] / num_evs, num_evs, axis=0)
+    total_demand_2d = charges_2d + demand_2d
+    max_demand_peak = float(total_demand_2d[:, in_peak].max()) if peak_periods2 else 0
+    max_demand_off_peak = float(total_demand_2d[:, in_off_peak].max()) if off_peak_periods2 else 0
+    wholesale_cost = float(np.sum(0.001 * prices_2d * (charges_2d + demand_2d) * interval_hours))
+    network_charge = network_tariff_peak * max_demand_peak + network_tariff_off_peak * max_demand_off_peak
+    minizinc_outputs = {
+        "wholesale_cost": [wholesale_cost],
+        "network_charge": [network_charge],
+        "max_demand_peak": [max_demand_peak],
+        "max_demand_off_peak": [max_demand_off_peak],
+        "time (ms)": [solve_time * 1000],
+    }
+    return charge_ev_day_period, minizinc_outputs
@@ -0,0 +1,157 @@
+import numpy as np
+from scipy.optimize import linprog
+from scipy.sparse import csr_matrix, vstack
+from time import perf_counter
+import scripts.profiling as profiling
+
+# highspy keeps an LP and its optimal basis between solves, so a changed LP is re-optimised from the last basis;
+# without it the callers that re-solve (the tariff sweep and the rolling schedule) solve cold with linprog
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+
+def build_lp(num_days, num_periods_day, peak_periods, off_peak_periods,
+             max_charge_units, total_energy_units,
+             prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+             availability_units=None, interval_hours=0.5):
+    # the same model as ev-scheduling.mzn, with one row of charge variables per unit
+    # (an EV, an EV class or the whole fleet), which can only charge in the periods of the day it is available;
+    # charges and demands are in kW, loads in kWh per period of interval_hours
+    # variables: charge[unit, day, period] flattened, then max_demand_peak and max_demand_off_peak
+    max_charge_units = np.asarray(max_charge_units, dtype=float)
+    total_energy_units = np.asarray(total_energy_units, dtype=float)
+    prices_2d = np.asarray(prices_2d, dtype=float)
+    loads_2d = np.asarray(loads_2d, dtype=float)
+    num_units = len(max_charge_units)
+    num_charges = num_units * num_days * num_periods_day
+    i_peak = num_charges
+    i_off_peak = num_charges + 1
+
+    # objective function
+    c = np.empty(num_charges + 2)
+    c[:num_charges] = np.tile((0.001 * prices_2d * interval_hours).ravel(), num_units)
+    c[i_peak] = network_tariff_peak
+    c[i_off_peak] = network_tariff_off_peak
+    constant_cost = float(np.sum(0.001 * prices_2d * loads_2d))
+
+    # charge constraint
+    bounds = np.zeros((num_charges + 2, 2))
+    if availability_units is None:
+        availability_units = np.ones((num_units, num_periods_day), dtype=bool)
+    bounds[:num_charges, 1] = np.broadcast_to(max_charge_units[:, None, None] * availability_units[:, None, :],
+                                              (num_units, num_days, num_periods_day)).ravel()
+    bounds[num_charges:] = [-np.inf, np.inf]
+
+    # energy constraint: one row per unit and day
+    rows = np.repeat(np.arange(num_units * num_days), num_periods_day)
+    a_eq = csr_matrix((np.full(num_charges, float(interval_hours)), (rows, np.arange(num_charges))),
+                      shape=(num_units * num_days, num_charges + 2))
+    b_eq = np.repeat(total_energy_units, num_days)
+
+    # max demand auxillary variables: one row per day and period in each period set
+    a_ub = []
+    for periods, i_demand in ((sorted(peak_periods), i_peak), (sorted(off_peak_periods), i_off_peak)):
+        if len(periods) == 0:
+            bounds[i_demand] = [0, 0]
+            continue
+        num_rows = num_days * len(periods)
+        day_period = (np.arange(num_days)[:, None] * num_periods_day + np.asarray(periods)[None, :]).ravel()
+        cols = (np.arange(num_units)[:, None] * num_days * num_periods_day + day_period[None, :]).ravel()
+        rows = np.concatenate([np.tile(np.arange(num_rows), num_units), np.arange(num_rows)])
+        cols = np.concatenate([cols, np.full(num_rows, i_demand)])
+        values = np.concatenate([np.ones(num_rows * num_units), -np.ones(num_rows)])
+        a_ub.append(csr_matrix((values, (rows, cols)), shape=(num_rows, num_charges + 2)))
+
+    b_ub = max_demand_b_ub(loads_2d, peak_periods, off_peak_periods, interval_hours)
+    return c, vstack(a_ub).tocsr(), b_ub, a_eq, b_eq, bounds, constant_cost
+
+
+def max_demand_b_ub(loads_2d, peak_periods, off_peak_periods, interval_hours=0.5):
+    # right-hand sides of the max demand rows of build_lp: minus the existing demand of each day and period
+    loads_2d = np.asarray(loads_2d, dtype=float)
+    return np.concatenate([-loads_2d[:, sorted(periods)].ravel() / interval_hours
+                           for periods in (peak_periods, off_peak_periods) if len(periods) > 0])
+
+
+def build_highs(c, a_ub, b_ub, a_eq, b_eq, bounds):
+    # the LP of build_lp as a highspy model, with the inequality rows first
+    highs = highspy.Highs()
+    highs.setOptionValue("output_flag", False)
+    inf = highspy.kHighsInf
+    lower = np.where(np.isinf(bounds[:, 0]), -inf, bounds[:, 0])
+    upper = np.where(np.isinf(bounds[:, 1]), inf, bounds[:, 1])
+    highs.addVars(len(c), lower, upper)
+    highs.changeColsCost(len(c), np.arange(len(c), dtype=np.int32), c)
+    a = vstack([a_ub, a_eq]).tocsr()
+    row_lower = np.concatenate([np.full(len(b_ub), -inf), b_eq])
+    row_upper = np.concatenate([b_ub, b_eq])
+    highs.addRows(a.shape[0], row_lower, row_upper, a.nnz,
+                  a.indptr[:-1].astype(np.int32), a.indices.astype(np.int32), a.data)
+    return highs
+
+
+def schedule_evs_lp(num_days, num_periods_day, peak_periods, off_peak_periods,
+                    num_evs, max_charge, total_energy,
+                    prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                    aggregate=False, interval_hours=0.5):
+
+    # the fleet is a single unit that is num_evs times larger than one EV
+    if aggregate:
+        max_charge_units = [num_evs * max_charge]
+        total_energy_units = [num_evs * total_energy]
+    else:
+        max_charge_units = [max_charge] * num_evs
+        total_energy_units = [total_energy] * num_evs
+    return schedule_units_lp(num_days, num_periods_day, peak_periods, off_peak_periods,
+                             max_charge_units, total_energy_units,
+                             prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                             interval_hours=interval_hours)
+
+
+def schedule_units_lp(num_days, num_periods_day, peak_periods, off_peak_periods,
+                      max_charge_units, total_energy_units,
+                      prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                      availability_units=None, interval_hours=0.5):
+
+    off_peak_periods2 = set(off_peak_periods)
+    if network_tariff_peak == network_tariff_off_peak:
+        peak_periods2 = set(range(num_periods_day))
+        network_tariff_off_peak = 0
+    else:
+        peak_periods2 = set(peak_periods)
+
+    # build and solve the LP in process
+    with profiling.stage("model build", backend="highs"):
+        c, a_ub, b_ub, a_eq, b_eq, bounds, constant_cost \
+            = build_lp(num_days, num_periods_day, peak_periods2, off_peak_periods2,
+                       max_charge_units, total_energy_units,
+                       prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak,
+                       availability_units, interval_hours)
+    with profiling.stage("solve", backend="highs") as record:
+        start_time = perf_counter()
+        result = linprog(c, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq, bounds=bounds, method="highs")
+        solve_time = perf_counter() - start_time
+        record.update(variables=len(c), constraints=a_ub.shape[0] + a_eq.shape[0], nonzeros=a_ub.nnz + a_eq.nnz,
+                      iterations=result.nit, status=result.status)
+    if result.status != 0:
+        raise RuntimeError(f"HiGHS failed to solve the EV scheduling LP: {result.message}")
+
+    # organise results in the same structure as the MiniZinc backend
+    num_units = len(max_charge_units)
+    charge_ev_day_period = result.x[:num_units * num_days * num_periods_day] \
+        .reshape((num_units, num_days, num_periods_day))
+    demand_2d = charge_ev_day_period.sum(axis=0) + np.asarray(loads_2d, dtype=float) / interval_hours
+    max_demand_peak = float(demand_2d[:, sorted(peak_periods2)].max()) if peak_periods2 else 0
+    max_demand_off_peak = float(demand_2d[:, sorted(off_peak_periods2)].max()) if off_peak_periods2 else 0
+    wholesale_cost = float(c[:-2] @ result.x[:-2]) + constant_cost
+    network_charge = network_tariff_peak * max_demand_peak + network_tariff_off_peak * max_demand_off_peak
+    minizinc_outputs = {
+        "wholesale_cost": [wholesale_cost],
+        "network_charge": [network_charge],
+        "max_demand_peak": [max_demand_peak],
+        "max_demand_off_peak": [max_demand_off_peak],
+        "time (ms)": [solve_time * 1000],
+    }
+    return charge_ev_day_period, minizinc_outputs
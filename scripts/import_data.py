@@ -1,27 +1,159 @@
-import pandas as pd
+import json
+import os
 import numpy as np
+import scripts.tariff_calendar as calendar
+
+
+def ingest_data(file_prices_data="data/wholesale_data.csv", file_load_data="data/load_data.csv",
+                store_dir="data/store", chunk_size=1000000):
+    # one-time conversion of the CSV files into a (days, periods of the whole day) binary layout,
+    # so that a daily time window is a column slice and a month is a row slice;
+    # pandas is only needed here, reading the store takes NumPy alone
+    import pandas as pd
+
+    # the timestamps size the store, then the values are streamed into it chunk by chunk,
+    # so that a multi-year 5-minute history is converted without holding it in memory
+    datetimes_prices = pd.read_csv(rf"{file_prices_data}", usecols=[0], parse_dates=[0]).iloc[:, 0]
+    # the most common step between the timestamps, which need not be in order in the file
+    resolution = int(datetimes_prices.drop_duplicates().sort_values().diff().median().total_seconds() // 60)
+    if resolution <= 0 or (24 * 60) % resolution != 0:
+        raise ValueError(f"The resolution of {file_prices_data} is {resolution} minutes, "
+                         f"which does not divide a day")
+    num_periods_day = 24 * 60 // resolution
+    first_day = datetimes_prices.min().normalize()
+    num_days = (datetimes_prices.max().normalize() - first_day).days + 1
+    del datetimes_prices
+
+    # missing periods are stored as NaN
+    os.makedirs(store_dir, exist_ok=True)
+    for file_data, column, name in ((file_prices_data, "WholesalePrice", "prices"), (file_load_data, "E", "loads")):
+        data = np.lib.format.open_memmap(os.path.join(store_dir, f"{name}.npy"), mode="w+", dtype=float,
+                                         shape=(num_days, num_periods_day))
+        data[:] = np.nan
+        data_flat = data.reshape(-1)
+        for df_chunk in pd.read_csv(rf"{file_data}", index_col=0, parse_dates=True, chunksize=chunk_size):
+            minutes = (df_chunk.index - first_day) // pd.Timedelta(minutes=1)
+            periods = minutes // resolution
+            is_stored = (minutes % resolution == 0) & (periods >= 0) & (periods < data_flat.size)
+            data_flat[periods[is_stored]] = df_chunk[column].to_numpy(dtype=float)[is_stored]
+        data.flush()
+        del data, data_flat
+
+    # the index of the first day of each month
+    days = np.datetime64(first_day.date(), "D") + np.arange(num_days)
+    months, month_offsets = np.unique(days.astype("datetime64[M]"), return_index=True)
+
+    np.save(os.path.join(store_dir, "days.npy"), days)
+    np.save(os.path.join(store_dir, "months.npy"), months)
+    np.save(os.path.join(store_dir, "month_offsets.npy"), np.append(month_offsets, num_days))
+    with open(os.path.join(store_dir, "meta.json"), "w") as f:
+        json.dump({"resolution": resolution,
+                   "sources": [os.path.abspath(file_prices_data), os.path.abspath(file_load_data)]}, f)
+
+
+def is_store_current(store_dir, file_prices_data, file_load_data):
+    file_meta = os.path.join(store_dir, "meta.json")
+    if not os.path.exists(file_meta):
+        return False
+    with open(file_meta) as f:
+        sources = json.load(f)["sources"]
+    store_time = os.path.getmtime(file_meta)
+    return sources == [os.path.abspath(file_prices_data), os.path.abspath(file_load_data)] \
+        and all(os.path.getmtime(file) <= store_time for file in (file_prices_data, file_load_data))
 
 
 def read_data(start_time_day, end_time_day,
               file_prices_data="data/wholesale_data.csv", file_load_data="data/load_data.csv",
-              use_prices=True, include_existing_demand=True):
+              use_prices=True, include_existing_demand=True, store_dir="data/store", months=None):
+    prices_year = []
+    loads_year = []
+    months_year = []
+    datetimes_year = []
+    for month, datetimes_2d, prices_2d, loads_2d in iter_months(start_time_day, end_time_day,
+                                                                file_prices_data, file_load_data,
+                                                                store_dir=store_dir, months=months):
+        prices_year.append(prices_2d)
+        loads_year.append(loads_2d)
+        months_year.append(month)
+        datetimes_year.append(datetimes_2d)
+
+    return prices_year, loads_year, np.array(months_year, dtype="datetime64[M]"), datetimes_year
+
+
+def iter_months(start_time_day, end_time_day,
+                file_prices_data="data/wholesale_data.csv", file_load_data="data/load_data.csv",
+                store_dir="data/store", months=None):
+    # yields (month, datetimes, prices, loads) one month at a time, each a (days, periods) array of the daily
+    # time window, so that only the month in use is held in memory; months is an optional list such as ["2019-03"]
+
+    # convert the CSV files only when they have changed
+    if not is_store_current(store_dir, file_prices_data, file_load_data):
+        ingest_data(file_prices_data, file_load_data, store_dir)
+
+    resolution = read_resolution(store_dir)
+    prices = np.load(os.path.join(store_dir, "prices.npy"), mmap_mode="r")
+    loads = np.load(os.path.join(store_dir, "loads.npy"), mmap_mode="r")
+    days = np.load(os.path.join(store_dir, "days.npy"))
+    months_data = np.load(os.path.join(store_dir, "months.npy"))
+    month_offsets = np.load(os.path.join(store_dir, "month_offsets.npy"))
+    if months is not None:
+        missing_months = set(months) - {str(month) for month in months_data}
+        if missing_months:
+            raise ValueError(f"No data for months {sorted(missing_months)}")
+
+    # the daily time window, including the end time; a window that ends before it starts runs over midnight,
+    # so each of its days also takes the periods up to the end time of the next day
+    num_periods_day = prices.shape[1]
+    start_period = period_of_day(start_time_day, resolution)
+    end_period = period_of_day(end_time_day, resolution) + 1
+    is_overnight = end_period <= start_period
+    if is_overnight:
+        end_period += num_periods_day
+    minutes_window = np.arange(start_period, end_period) * np.timedelta64(resolution, "m")
+
+    for month, first_day, end_day in zip(months_data, month_offsets[:-1], month_offsets[1:]):
+        if months is not None and str(month) not in months:
+            continue
+        if is_overnight:
+            # the last day of the data has no next day, so a last month of a single day has no window at all
+            end_day = min(end_day, len(days) - 1)
+            if end_day <= first_day:
+                continue
+            prices_2d = np.concatenate([prices[first_day:end_day, start_period:],
+                                        prices[first_day + 1:end_day + 1, :end_period - num_periods_day]], axis=1)
+            loads_2d = np.concatenate([loads[first_day:end_day, start_period:],
+                                       loads[first_day + 1:end_day + 1, :end_period - num_periods_day]], axis=1)
+        else:
+            # views of the memory-mapped store
+            prices_2d = prices[first_day:end_day, start_period:end_period]
+            loads_2d = loads[first_day:end_day, start_period:end_period]
+        datetimes_2d = days[first_day:end_day, None] + minutes_window[None, :]
+
+        # days without any data in the window are left out, such as the day of a period-ending last timestamp,
+        # and so are months without any such day; a day missing only some periods cannot be scheduled
+        is_missing = np.isnan(prices_2d) | np.isnan(loads_2d)
+        is_day_empty = is_missing.all(axis=1)
+        if np.any(is_missing[~is_day_empty]):
+            missing_datetimes = datetimes_2d[is_missing & ~is_day_empty[:, None]]
+            raise ValueError(f"Missing prices or loads of {len(missing_datetimes)} periods in {month}, "
+                             f"from {missing_datetimes[0]} to {missing_datetimes[-1]}")
+        if is_day_empty.all():
+            continue
+        if is_day_empty.any():
+            prices_2d = prices_2d[~is_day_empty]
+            loads_2d = loads_2d[~is_day_empty]
+            datetimes_2d = datetimes_2d[~is_day_empty]
+        yield month, datetimes_2d, prices_2d, loads_2d
 
-    # read wholesale prices
-    df_prices = pd.read_csv(rf"{file_prices_data}", index_col=0, parse_dates=True)
-    df_prices_filtered = df_prices.between_time(start_time_day, end_time_day)
-    df_datetimes_year = df_prices_filtered.index.to_frame()
-    prices_year = df_prices_filtered.groupby(pd.Grouper(freq="M"))["WholesalePrice"].apply(list)
 
-    # read existing loads
-    df_loads = pd.read_csv(rf"{file_load_data}", index_col=0, parse_dates=True)
-    df_loads_filtered = df_loads.between_time(start_time_day, end_time_day)
-    loads_year = df_loads_filtered.groupby(pd.Grouper(freq="M"))["E"].apply(list)
+def read_resolution(store_dir="data/store"):
+    # minutes per period of the data
+    with open(os.path.join(store_dir, "meta.json")) as f:
+        return json.load(f)["resolution"]
 
-    # read date time ranges
-    months_year = prices_year.index
-    datetimes_year = df_datetimes_year.groupby(pd.Grouper(freq="M"))["Datetime"].apply(list)
 
-    return prices_year, loads_year, months_year, datetimes_year
+def period_of_day(time_day, resolution):
+    return calendar.minutes_of_day(time_day) // resolution
 
 
 def reshape_data(data_array, num_row, num_column):
@@ -1,12 +1,7 @@
-from pandas_bokeh import *
-from bokeh.layouts import layout
-from bokeh.models import *
-from bokeh.plotting import figure, output_file
-from bokeh.palettes import Set2
 from datetime import datetime
 import numpy as np
+import scripts.tariff_calendar as calendar
 
-colour_choices = Set2[8]
 days_week = {
     0: "Mon.",
     1: "Tue.",
@@ -19,31 +14,26 @@ days_week = {
 
 
 def merge_results(charge_ev_day_period, loads_month, prices_month, datetime_month,
-                  max_demand_peak, max_demand_off_peak):
-    # combine results
-    charge_month = []
-    for charge_ev in charge_ev_day_period:
-        charge_ev_month = []
-        for charge_ev_day in charge_ev:
-            charge_ev_month.extend(charge_ev_day)
-        charge_month.append(charge_ev_month)
-    total_charge_month = np.sum(charge_month, axis=0).tolist()
-    demand_month = [x * 2 for x in loads_month]
-    total_demand_month = [c + l for c, l in zip(total_charge_month, demand_month)]
-    total_periods = len(loads_month)
-    peak_periods_month = [v for i, v in enumerate(range(total_periods))
-                          if 16 <= datetime_month[i].hour <= 21]
-    wholesale_cost_month = [x * y * 0.001 * 0.5 for x, y in zip(total_demand_month, prices_month)]
+                  max_demand_peak, max_demand_off_peak,
+                  interval_hours=0.5, peak_windows=calendar.default_peak_windows):
+    # combine results as column arrays: the solution is an (evs, days, periods) array,
+    # the loads are energies per period and the demands are in kW
+    total_charge_month = np.sum(np.asarray(charge_ev_day_period, dtype=float), axis=0).ravel()
+    demand_month = np.asarray(loads_month, dtype=float) / interval_hours
+    total_demand_month = total_charge_month + demand_month
+    prices_month = np.asarray(prices_month, dtype=float)
+    datetime_month = np.asarray(datetime_month, dtype="datetime64[s]")
+    is_peak_month = calendar.is_peak_datetimes(datetime_month, peak_windows)
+    wholesale_cost_month = total_demand_month * prices_month * 0.001 * interval_hours
 
     combine_data_source_dict = {
-        "Datetime": [timestamp.strftime("%Y-%m-%d %H:%M:%S") for timestamp in datetime_month],
-        "Periods": [i for i in range(total_periods)],
+        "Datetime": np.char.replace(np.datetime_as_string(datetime_month, unit="s"), "T", " "),
+        "Periods": np.arange(len(demand_month)),
         "EVs": total_charge_month,
         "Existing": demand_month,
         "Total": total_demand_month,
         "Prices": prices_month,
-        "Max": [max_demand_peak[0] if i in peak_periods_month else max_demand_off_peak[0] for i in
-                       range(total_periods)],
+        "Max": np.where(is_peak_month, max_demand_peak[0], max_demand_off_peak[0]),
         "WCost": wholesale_cost_month,
         # "NCharge": network_charge_month,
         # "Obj": [x + y for x, y in zip(wholesale_cost_month, network_charge_month)],
@@ -52,6 +42,13 @@ def merge_results(charge_ev_day_period, loads_month, prices_month, datetime_mont
 
 
 def visualise_monthly_results(figure_title, datetime_month, data_source_dict, prices_month, minizinc_outputs):
+    # Bokeh is only loaded when something is plotted
+    from bokeh.models import ColumnDataSource, DataTable, FuncTickFormatter, HoverTool, Legend, LinearAxis, \
+        NumberFormatter, Range1d, TableColumn
+    from bokeh.palettes import Set2
+    from bokeh.plotting import figure
+    colour_choices = Set2[8]
+
     bokeh_data_source = ColumnDataSource(data_source_dict)
     WOD_dict = {}
     for i, s in enumerate([str(x) for x in datetime_month]):
@@ -111,3 +108,88 @@ def visualise_monthly_results(figure_title, datetime_month, data_source_dict, pr
     data_table = DataTable(source=datatable_source, columns=columns, width=2000, height=80)
 
     return p_month, data_table
+
+
+def downsample_minmax(columns, max_points, reference_columns=None):
+    # min/max decimation: each bucket of periods keeps the rows of the minimum and the maximum of every reference
+    # column (all the columns by default), in time order, so peaks survive and every column of a kept row comes
+    # from the same period
+    reference_columns = list(columns) if reference_columns is None else list(reference_columns)
+    num_points = len(next(iter(columns.values())))
+    num_buckets = max_points // (2 * len(reference_columns))
+    if num_points <= max_points or num_buckets == 0:
+        return columns
+    edges = np.linspace(0, num_points, num_buckets + 1).astype(int)
+    bucket = np.repeat(np.arange(num_buckets), np.diff(edges))
+    rows = []
+    for k in reference_columns:
+        # sorted by bucket then value, the first and the last row of each bucket are its minimum and its maximum
+        order = np.lexsort((np.asarray(columns[k]), bucket))
+        rows += [order[edges[:-1]], order[edges[1:] - 1]]
+    rows = np.unique(np.concatenate(rows))
+    return {k: np.asarray(v)[rows] for k, v in columns.items()}
+
+
+def visualise_monthly_results_scalable(figure_titles, datetime_month, data_source_dicts, prices_month,
+                                       minizinc_outputs_list, max_points=4000):
+    from bokeh.models import ColumnDataSource, DataTable, DatetimeTickFormatter, HoverTool, Legend, LinearAxis, \
+        NumberFormatter, Range1d, TableColumn
+    from bokeh.palettes import Set2
+    from bokeh.plotting import figure
+    colour_choices = Set2[8]
+
+    # all the tariff variants of a month share one data source on a datetime axis;
+    # the existing demand and the prices are only stored once
+    columns = {
+        "Datetime": np.asarray(datetime_month, dtype="datetime64[ms]"),
+        "Existing": data_source_dicts[0]["Existing"],
+        "Prices": data_source_dicts[0]["Prices"],
+    }
+    for i, data_source_dict in enumerate(data_source_dicts):
+        for k in ("EVs", "Total", "Max"):
+            columns[f"{k}_{i}"] = data_source_dict[k]
+    bokeh_data_source = ColumnDataSource(downsample_minmax(columns, max_points,
+                                                           [f"Total_{i}" for i in range(len(data_source_dicts))]))
+    price_range = Range1d(start=float(np.min(prices_month)), end=float(np.max(prices_month)))
+
+    figures_tables = []
+    x_range = None
+    for i, (figure_title, minizinc_outputs) in enumerate(zip(figure_titles, minizinc_outputs_list)):
+        # draw graphs that pan and zoom together
+        p_month = figure(title=figure_title, plot_width=2000, plot_height=500, x_axis_type="datetime",
+                         output_backend="webgl", **({"x_range": x_range} if x_range is not None else {}))
+        x_range = p_month.x_range
+        p_month.yaxis.axis_label = "Demand (kW)"
+        p_month.xaxis.formatter = DatetimeTickFormatter(hours=["%a %d %H:%M"], days=["%a %d %b"])
+        p_month.extra_y_ranges = {"WholesalePrices": price_range}
+        p_month.add_layout(LinearAxis(y_range_name="WholesalePrices", axis_label="Price ($/kWh)"), 'right')
+
+        legend_items = []
+        for colour_index, (k, legend_label) in enumerate(((f"EVs_{i}", "Out: EVs demand"),
+                                                          ("Existing", "In: Existing demand"),
+                                                          (f"Total_{i}", "Out: Total demand"),
+                                                          ("Prices", "In: Prices"),
+                                                          (f"Max_{i}", "Out: Max demand"))):
+            if k == "Prices":
+                pl = p_month.line(y=k, x="Datetime", source=bokeh_data_source, line_width=2, line_dash="dashed",
+                                  y_range_name='WholesalePrices', color=colour_choices[colour_index])
+            else:
+                pl = p_month.line(y=k, x="Datetime", source=bokeh_data_source, line_width=2,
+                                  color=colour_choices[colour_index])
+            legend_items.append((legend_label, [pl]))
+        tooltips = [("Datetime", "@Datetime{%F %H:%M}"), ("EVs", f"@EVs_{i} kW"), ("Existing", "@Existing kW"),
+                    ("Total", f"@Total_{i} kW"), ("Prices", "@Prices $/MWh"), ("Max", f"@Max_{i} kW")]
+        p_month.add_tools(HoverTool(renderers=[legend_items[-1][1][0]], tooltips=tooltips,
+                                    formatters={"@Datetime": "datetime"}, mode='vline'))
+
+        legend = Legend(items=legend_items, location="center", orientation="horizontal", click_policy="hide")
+        p_month.add_layout(legend, 'above')
+
+        # make a data table
+        datatable_source = ColumnDataSource(data=minizinc_outputs)
+        table_columns = [TableColumn(field=k, title=k.replace("_", " "), formatter=NumberFormatter(format='0.00'))
+                         for k in minizinc_outputs.keys()]
+        data_table = DataTable(source=datatable_source, columns=table_columns, width=2000, height=80)
+        figures_tables.extend([p_month, data_table])
+
+    return figures_tables
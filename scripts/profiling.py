@@ -0,0 +1,136 @@
+import json
+import os
+import resource
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+from time import perf_counter
+
+# tracing is off until start_trace is called in this process
+trace_file = None
+trace_memory = False
+current_tags = {}
+peak_stack = []
+
+
+def start_trace(file, memory=False, truncate=False):
+    # the wall time of the stages is cheap to record, their peak memory needs tracemalloc, which slows down
+    # every allocation and so is only traced on request; the process that starts a run truncates the trace file,
+    # the worker processes then append to it
+    global trace_file, trace_memory
+    trace_file = file
+    trace_memory = memory and file is not None
+    if file is not None:
+        os.makedirs(os.path.dirname(file) or ".", exist_ok=True)
+        if truncate:
+            open(file, "w").close()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+@contextmanager
+def tags(**new_tags):
+    # tags such as the month and the tariffs are added to every stage recorded inside
+    global current_tags
+    previous_tags = current_tags
+    current_tags = dict(previous_tags, **new_tags)
+    try:
+        yield
+    finally:
+        current_tags = previous_tags
+
+
+@contextmanager
+def stage(name, **info):
+    # records the wall time and, if traced, the peak memory of a stage; the caller can add statistics to the record
+    record = dict(current_tags, stage=name, **info)
+    if trace_file is None:
+        yield record
+        return
+    if not trace_memory:
+        start_time = perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall_time_s"] = perf_counter() - start_time
+            record["pid"] = os.getpid()
+            write_record(record)
+        return
+
+    # nested stages reset the tracemalloc peak, so the enclosing peaks are kept on a stack
+    if peak_stack:
+        peak_stack[-1] = max(peak_stack[-1], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    peak_stack.append(0)
+    start_time = perf_counter()
+    try:
+        yield record
+    finally:
+        record["wall_time_s"] = perf_counter() - start_time
+        peak = max(peak_stack.pop(), tracemalloc.get_traced_memory()[1])
+        if peak_stack:
+            peak_stack[-1] = max(peak_stack[-1], peak)
+        tracemalloc.reset_peak()
+        record["peak_memory_mb"] = peak / 1024 ** 2
+        record["pid"] = os.getpid()
+        write_record(record)
+
+
+def write_record(record):
+    # one line per record, appended so that worker processes can share the trace file
+    with open(trace_file, "a") as f:
+        f.write(json.dumps(record, default=to_json) + "\n")
+
+
+def to_json(value):
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def children_max_rss_mb():
+    # the largest resident memory of any subprocess this process has waited for, in MB (ru_maxrss is in kB on
+    # Linux); a high-water mark over the life of the process, not the memory of the last subprocess
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+@contextmanager
+def solver_memory(record):
+    # the peak memory of the solver subprocesses of a stage is only known when they raise the high-water mark,
+    # otherwise it is at most the mark and is recorded as None
+    max_rss_before = children_max_rss_mb()
+    try:
+        yield
+    finally:
+        max_rss_after = children_max_rss_mb()
+        record["children_max_rss_mb"] = max_rss_after
+        record["solver_max_rss_mb"] = max_rss_after if max_rss_after > max_rss_before else None
+
+
+def summarise(file):
+    # a table of the total and the worst wall time and memory of each stage, built without pandas
+    # so that printing it does not slow down a headless run; the memory is None unless it was traced
+    stages = {}
+    with open(file) as f:
+        for line in f:
+            record = json.loads(line)
+            summary = stages.setdefault(record["stage"], {"count": 0, "total_time_s": 0.0, "max_time_s": 0.0,
+                                                          "max_memory_mb": None})
+            summary["count"] += 1
+            summary["total_time_s"] += record["wall_time_s"]
+            summary["max_time_s"] = max(summary["max_time_s"], record["wall_time_s"])
+            if "peak_memory_mb" in record:
+                summary["max_memory_mb"] = max(summary["max_memory_mb"] or 0.0, record["peak_memory_mb"])
+    return stages
+
+
+def format_summary(stages):
+    header = ["stage", "count", "total_time_s", "max_time_s", "max_memory_mb"]
+    rows = [[stage, str(summary["count"])] + ["-" if summary[k] is None else f"{summary[k]:.3f}" for k in header[2:]]
+            for stage, summary in sorted(stages.items())]
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+    return "\n".join("  ".join(value.ljust(width) if i == 0 else value.rjust(width)
+                               for i, (value, width) in enumerate(zip(row, widths)))
+                     for row in [header] + rows)
@@ -0,0 +1,75 @@
+import csv
+import os
+import numpy as np
+
+index_file_name = "index.csv"
+evs_per_chunk = 1000  # EVs per stored chunk, so that one EV of a large fleet is read without the others
+index_columns = ["month", "network_tariff_peak", "network_tariff_off_peak", "file",
+                 "num_evs", "aggregate", "num_days", "num_periods_day",
+                 "wholesale_cost", "network_charge", "max_demand_peak", "max_demand_off_peak", "time (ms)"]
+
+
+def schedule_file_name(month, network_tariff_peak, network_tariff_off_peak):
+    return f"{month}-peak-{network_tariff_peak:g}-off-peak-{network_tariff_off_peak:g}.npz"
+
+
+def save_month(run_dir, month, network_tariff_peak, network_tariff_off_peak,
+               charge_ev_day_period, minizinc_outputs, num_evs, aggregate=False):
+    # one compressed file per month and tariff pair, with one (evs, periods) chunk per day and group of EVs
+    # so that a day or an EV can be read without decompressing the month;
+    # an aggregate schedule has a single fleet row per day, which num_evs and aggregate record in the index
+    os.makedirs(run_dir, exist_ok=True)
+    charge_ev_day_period = np.asarray(charge_ev_day_period, dtype=float)
+    num_rows, num_days, num_periods_day = charge_ev_day_period.shape
+    num_groups = int(np.ceil(num_rows / evs_per_chunk))
+    file = schedule_file_name(month, network_tariff_peak, network_tariff_off_peak)
+    chunks = {chunk_name(d, g): charge_ev_day_period[g * evs_per_chunk:(g + 1) * evs_per_chunk, d, :]
+              for d in range(num_days) for g in range(num_groups)}
+    np.savez_compressed(os.path.join(run_dir, file), evs_per_chunk=evs_per_chunk, **chunks)
+
+    # the index holds the objective breakdown of every month and tariff pair of the run,
+    # a month and tariff pair solved again (e.g. a reused run name) replaces its row as it replaces its file
+    index_file = os.path.join(run_dir, index_file_name)
+    rows = []
+    if os.path.exists(index_file):
+        with open(index_file, newline="") as f:
+            rows = [row for row in csv.DictReader(f) if row["file"] != file]
+    rows.append(dict(zip(index_columns, [
+        month, network_tariff_peak, network_tariff_off_peak, file,
+        num_evs, aggregate, num_days, num_periods_day,
+        minizinc_outputs["wholesale_cost"][0], minizinc_outputs["network_charge"][0],
+        minizinc_outputs["max_demand_peak"][0], minizinc_outputs["max_demand_off_peak"][0],
+        minizinc_outputs["time (ms)"][0]])))
+    with open(index_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=index_columns, extrasaction="ignore", restval="")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def read_index(run_dir):
+    import pandas as pd
+    return pd.read_csv(os.path.join(run_dir, index_file_name))
+
+
+def chunk_name(day, group):
+    return f"day_{day:03d}_evs_{group:04d}"
+
+
+def load_schedule(run_dir, month, network_tariff_peak, network_tariff_off_peak, day=None, ev=None):
+    # the whole (evs, days, periods) schedule (a single fleet row for an aggregate run),
+    # the (evs, periods) schedule of a day, the (days, periods) schedule of an EV
+    # or the (periods,) schedule of an EV on a day; only the chunks of the requested days and EVs are decompressed
+    file = os.path.join(run_dir, schedule_file_name(month, network_tariff_peak, network_tariff_off_peak))
+    with np.load(file) as chunks:
+        num_evs_chunk = int(chunks["evs_per_chunk"])
+        names = [name for name in chunks.files if name.startswith("day_")]
+        num_days = len({name[:7] for name in names})
+        num_groups = len(names) // num_days
+        days = range(num_days) if day is None else [day]
+        if ev is not None:
+            charge_day_period = np.stack([chunks[chunk_name(d, ev // num_evs_chunk)][ev % num_evs_chunk]
+                                          for d in days])
+        else:
+            charge_day_period = np.stack([np.concatenate([chunks[chunk_name(d, g)] for g in range(num_groups)])
+                                          for d in days], axis=-2)
+        return charge_day_period if day is None else charge_day_period[..., 0, :]
@@ -0,0 +1,46 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import scripts.ev_scheduling as ev
+import scripts.profiling as profiling
+
+
+def solve_scenario(scenario):
+    # each scenario is a dict of schedule_evs arguments, solved by its own solver subprocess,
+    # and optional trace_tags identifying it in the trace;
+    # a scenario without a schedule, e.g. when the time limit runs out before any solution is found,
+    # gives no schedule and the error in its outputs rather than stopping the other scenarios
+    scenario = dict(scenario)
+    with profiling.tags(**scenario.pop("trace_tags", {})):
+        try:
+            return ev.schedule_evs(**scenario)
+        except RuntimeError as e:
+            return None, {"error": [str(e)]}
+
+
+def run_scenarios(scenarios, num_workers=None, trace_file=None, trace_memory=False):
+    # the solves are independent, so they are farmed out to a pool of worker processes
+    # and gathered back in the order they were given
+    return list(iter_scenarios(scenarios, num_workers, trace_file, trace_memory=trace_memory))
+
+
+def iter_scenarios(scenarios, num_workers=None, trace_file=None, max_pending=None, trace_memory=False):
+    # yields the results in the order of the scenarios, which can be a generator: it is only read
+    # max_pending scenarios ahead of the results (twice the number of workers by default),
+    # so the inputs and results of a long horizon are never all in memory at once
+    if num_workers == 1:
+        profiling.start_trace(trace_file, trace_memory)
+        for scenario in scenarios:
+            yield solve_scenario(scenario)
+        return
+    num_workers = num_workers or os.cpu_count()
+    max_pending = max_pending or 2 * num_workers
+    with ProcessPoolExecutor(max_workers=num_workers,
+                             initializer=profiling.start_trace, initargs=(trace_file, trace_memory)) as pool:
+        pending = deque()
+        for scenario in scenarios:
+            pending.append(pool.submit(solve_scenario, scenario))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scripts.ev_scheduling as ev
+import scripts.import_data as input
+import scripts.tariff_calendar as calendar
+
+# default schedule request, the same scenario as main.py
+default_request = {
+    "network_tariff_peak": 15,
+    "network_tariff_off_peak": 3,
+    "peak_windows": [list(window) for window in calendar.default_peak_windows],
+    "num_evs": 1000,
+    "max_charge": 25,
+    "total_energy": 20,
+    "use_existing_load": True,
+    "use_wholesale_prices": True,
+    "aggregate": True,
+    "backend": "highs",
+    "return_schedule": False,
+}
+
+# the MiniZinc solver looked up when a worker starts, the default of ev_scheduling
+default_minizinc_solver = "mip"
+
+# the data of each worker process, loaded once when the worker starts
+worker_data = {}
+
+
+def start_worker(start_time_day, end_time_day, file_prices_data, file_load_data, store_dir):
+    # warm up a worker: import the solver backends, which the scheduler only imports on its first solve,
+    # find the MiniZinc solvers if MiniZinc is installed, and map the data of every month
+    import scripts.ev_scheduling_lp
+    if importlib.util.find_spec("minizinc") is not None:
+        import scripts.solve_policy
+        scripts.solve_policy.mzn.Solver.lookup(default_minizinc_solver)
+    interval_hours = calendar.interval_hours(input.read_resolution(store_dir))
+    for month, datetimes_2d, prices_2d, loads_2d in input.iter_months(start_time_day, end_time_day,
+                                                                      file_prices_data, file_load_data,
+                                                                      store_dir=store_dir):
+        worker_data[str(month)] = (datetimes_2d[0], prices_2d, loads_2d, interval_hours)
+
+
+def schedule_request(request):
+    request = dict(default_request, **request)
+    if request["month"] not in worker_data:
+        raise ValueError(f"No data for month {request['month']}, expected one of {sorted(worker_data)}")
+    datetimes_day, prices_2d, loads_2d, interval_hours = worker_data[request["month"]]
+    num_days, num_periods_day = prices_2d.shape
+    if not request["use_wholesale_prices"]:
+        prices_2d = np.zeros(prices_2d.shape)
+    if not request["use_existing_load"]:
+        loads_2d = np.zeros(loads_2d.shape)
+    # the periods of a request override its time windows
+    if "peak_periods" in request:
+        peak_periods = set(request["peak_periods"])
+        off_peak_periods = set(request.get("off_peak_periods", set(range(num_periods_day)) - peak_periods))
+    else:
+        peak_periods, off_peak_periods = calendar.tariff_periods(datetimes_day, request["peak_windows"])
+
+    charge_ev_day_period, minizinc_outputs \
+        = ev.schedule_evs(num_days, num_periods_day, peak_periods, off_peak_periods,
+                          request["num_evs"], request["max_charge"], request["total_energy"],
+                          prices_2d, loads_2d, request["network_tariff_peak"], request["network_tariff_off_peak"],
+                          aggregate=request["aggregate"], backend=request["backend"], interval_hours=interval_hours)
+    response = {"month": request["month"], "minizinc_outputs": minizinc_outputs}
+    if request["return_schedule"]:
+        # the fleet schedule, summed over the EVs
+        response["charge_day_period"] = np.sum(np.asarray(charge_ev_day_period, dtype=float), axis=0).tolist()
+    return response
+
+
+class SchedulingService:
+    # accepts JSON schedule requests, one per line, and answers each with one JSON line,
+    # running at most max_concurrency solves at a time on a pool of warm workers;
+    # the requests of a connection can be pipelined and are solved concurrently, so the answers come back
+    # in the order they finish, each with the "id" of its request if it had one
+
+    def __init__(self, pool, max_concurrency):
+        self.pool = pool
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def schedule(self, request):
+        async with self.semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, schedule_request, request)
+
+    async def answer(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.pop("id", None)
+            response = await self.schedule(request)
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        if request_id is not None:
+            response["id"] = request_id
+        # a whole line is written at once, so the answers never interleave
+        writer.write((json.dumps(response) + "\n").encode())
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self.answer(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # answer the requests still being solved before closing the connection
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+
+async def serve(args):
+    # convert the data before the workers start, so that they only map it
+    input.read_data(args.start_time_day, args.end_time_day, args.file_prices_data, args.file_load_data,
+                    store_dir=args.store_dir)
+    num_workers = args.num_workers or os.cpu_count()
+    pool = ProcessPoolExecutor(max_workers=num_workers, initializer=start_worker,
+                               initargs=(args.start_time_day, args.end_time_day,
+                                         args.file_prices_data, args.file_load_data, args.store_dir))
+
+    # start every worker now rather than on the first requests
+    await asyncio.gather(*[asyncio.get_running_loop().run_in_executor(pool, int)
+                           for _ in range(num_workers)])
+    service = SchedulingService(pool, args.max_concurrency or num_workers)
+    if args.socket is not None:
+        server = await asyncio.start_unix_server(service.handle_connection, path=args.socket)
+    else:
+        server = await asyncio.start_server(service.handle_connection, host=args.host, port=args.port)
+    print(f"Serving schedule requests on {args.socket or f'{args.host}:{args.port}'}...")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve EV schedule requests as JSON lines over a local socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", help="path of a unix socket to listen on instead of a TCP port")
+    parser.add_argument("--num-workers", type=int, default=None, help="solver processes, default one per CPU")
+    parser.add_argument("--max-concurrency", type=int, default=None,
+                        help="requests solved at the same time, default the number of workers")
+    parser.add_argument("--start-time-day", default="9:00")
+    parser.add_argument("--end-time-day", default="16:30")
+    parser.add_argument("--file-prices-data", default="data/wholesale_data.csv")
+    parser.add_argument("--file-load-data", default="data/load_data.csv")
+    parser.add_argument("--store-dir", default="data/store")
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+
+def make_key(model_file, num_days, num_periods_day, peak_periods, off_peak_periods,
+             num_evs, max_charge, total_energy,
+             prices_2d, loads_2d, network_tariff_peak, network_tariff_off_peak, **options):
+    # the key is a hash of the model and every input that can change the solution
+    h = hashlib.sha256()
+    with open(model_file, "rb") as f:
+        h.update(f.read())
+    for data in (prices_2d, loads_2d):
+        data = np.ascontiguousarray(data, dtype=float)
+        h.update(str(data.shape).encode())
+        h.update(data.tobytes())
+    params = [num_days, num_periods_day, sorted(peak_periods), sorted(off_peak_periods),
+              num_evs, max_charge, total_energy, network_tariff_peak, network_tariff_off_peak,
+              sorted(options.items())]
+    h.update(json.dumps(params, default=str).encode())
+    return h.hexdigest()
+
+
+def load_result(key, cache_dir):
+    file = os.path.join(cache_dir, f"{key}.npz")
+    if not os.path.exists(file):
+        return None
+    with np.load(file, allow_pickle=False) as data:
+        charge_ev_day_period = data["charge_ev_day_period"]
+        minizinc_outputs = json.loads(str(data["minizinc_outputs"]))
+
+    # refresh the modification time so that eviction removes the least recently used results first
+    os.utime(file)
+    return charge_ev_day_period, minizinc_outputs
+
+
+def save_result(key, cache_dir, charge_ev_day_period, minizinc_outputs, max_size=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    file = os.path.join(cache_dir, f"{key}.npz")
+    tmp_file = os.path.join(cache_dir, f"{key}.{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp_file, charge_ev_day_period=np.asarray(charge_ev_day_period, dtype=float),
+                        minizinc_outputs=json.dumps(minizinc_outputs))
+    os.replace(tmp_file, file)
+    if max_size is not None:
+        evict(cache_dir, max_size)
+
+
+def evict(cache_dir, max_size):
+    # remove the least recently used results until the cache fits in max_size bytes
+    files = [os.path.join(cache_dir, f) for f in os.listdir(cache_dir)
+             if f.endswith(".npz") and not f.endswith(".tmp.npz")]
+    files.sort(key=os.path.getmtime)
+    total_size = sum(os.path.getsize(f) for f in files)
+    for file in files:
+        if total_size <= max_size:
+            break
+        try:
+            total_size -= os.path.getsize(file)
+            os.remove(file)
+        except FileNotFoundError:
+            # already evicted by another worker
+            pass
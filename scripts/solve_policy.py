@@ -0,0 +1,77 @@
+import asyncio
+from datetime import timedelta
+import minizinc as mzn
+
+
+def solve_options(solver, time_limit=None, mip_gap=None):
+    # the time limit applies to every solver, the gap only to the solvers that accept it (the MIP ones)
+    options = {}
+    if time_limit is not None:
+        options["timeout"] = timedelta(seconds=time_limit)
+    if mip_gap is not None and "--relGap" in [flag[0] for flag in solver.extraFlags]:
+        options["relGap"] = mip_gap
+    return options
+
+
+def relative_gap(result):
+    statistics = result.statistics
+    if "objective" not in statistics or "objectiveBound" not in statistics:
+        return None
+    objective = statistics["objective"]
+    return abs(objective - statistics["objectiveBound"]) / max(abs(objective), 1e-9)
+
+
+def is_good_enough(result, mip_gap):
+    if result.status == mzn.Status.OPTIMAL_SOLUTION:
+        return True
+    gap = relative_gap(result)
+    return mip_gap is not None and gap is not None and gap <= mip_gap
+
+
+def solve(model, set_data, solvers=("mip",), time_limit=None, mip_gap=None):
+    # set_data fills the data of an instance, which is done once for each solver
+    instances = []
+    for solver_name in solvers:
+        solver = mzn.Solver.lookup(solver_name)
+        ins = mzn.Instance(solver, model)
+        set_data(ins)
+        instances.append((ins, solve_options(solver, time_limit, mip_gap)))
+
+    if len(instances) == 1:
+        ins, options = instances[0]
+        result = ins.solve(**options)
+    else:
+        result = asyncio.run(race(instances, mip_gap))
+    if result.solution is None:
+        raise RuntimeError(f"No EV schedule was found: {result.status}")
+    return result
+
+
+async def race(instances, mip_gap):
+    # portfolio mode: the solvers run concurrently, the first result that is optimal or within the gap wins
+    # and the others are cancelled; otherwise the best result found within the time limit is used
+    tasks = [asyncio.create_task(ins.solve_async(**options)) for ins, options in instances]
+    pending = set(tasks)
+    best_result = None
+    errors = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                    continue
+                result = task.result()
+                if result.solution is None:
+                    continue
+                if is_good_enough(result, mip_gap):
+                    return result
+                if best_result is None or result.objective < best_result.objective:
+                    best_result = result
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    if best_result is None:
+        raise RuntimeError(f"None of the solvers found an EV schedule: {errors}")
+    return best_result
@@ -0,0 +1,37 @@
+import numpy as np
+
+# a tariff calendar is a list of daily ("HH:MM", "HH:MM") windows in which the peak network tariff applies,
+# every other period of the day is off peak; the end of a window is exclusive and a window that ends before
+# it starts runs over midnight, e.g. ("22:00", "2:00")
+default_peak_windows = [("16:00", "22:00")]
+
+
+def minutes_of_day(time_day):
+    hours, minutes = time_day.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def is_peak_datetimes(datetimes, peak_windows=default_peak_windows):
+    # whether each period is peak, from the time of the day it starts
+    datetimes = np.asarray(datetimes, dtype="datetime64[m]")
+    minutes = (datetimes - datetimes.astype("datetime64[D]")).astype(int)
+    is_peak = np.zeros(minutes.shape, dtype=bool)
+    for start_time, end_time in peak_windows:
+        start_minute = minutes_of_day(start_time)
+        end_minute = minutes_of_day(end_time)
+        if start_minute <= end_minute:
+            is_peak |= (start_minute <= minutes) & (minutes < end_minute)
+        else:
+            is_peak |= (start_minute <= minutes) | (minutes < end_minute)
+    return is_peak
+
+
+def tariff_periods(datetimes_day, peak_windows=default_peak_windows):
+    # the peak and off peak period sets of the daily window, given the datetimes of the periods of one day
+    is_peak = is_peak_datetimes(datetimes_day, peak_windows)
+    return set(np.flatnonzero(is_peak).tolist()), set(np.flatnonzero(~is_peak).tolist())
+
+
+def interval_hours(resolution):
+    # the length of a period in hours, which converts between a demand in kW and an energy in kWh
+    return resolution / 60
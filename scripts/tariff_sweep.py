@@ -0,0 +1,103 @@
+import itertools
+import numpy as np
+import pandas as pd
+from scipy.optimize import linprog
+from time import perf_counter
+import scripts.ev_scheduling_lp as lp
+import scripts.profiling as profiling
+
+
+def tariff_grid(network_tariffs_peak, network_tariffs_off_peak):
+    return list(itertools.product(network_tariffs_peak, network_tariffs_off_peak))
+
+
+def period_sets(num_periods_day, peak_periods, off_peak_periods, network_tariff_peak, network_tariff_off_peak):
+    # the same rule as schedule_evs: equal tariffs charge the peak tariff on the demand of the whole day
+    if network_tariff_peak == network_tariff_off_peak:
+        return tuple(range(num_periods_day)), tuple(sorted(off_peak_periods)), 0
+    return tuple(sorted(peak_periods)), tuple(sorted(off_peak_periods)), network_tariff_off_peak
+
+
+class LPSweeper:
+    # the LP of one month and one pair of period sets, re-solved with different network tariffs
+
+    def __init__(self, c, a_ub, b_ub, a_eq, b_eq, bounds):
+        self.c = c
+        self.a_ub, self.b_ub, self.a_eq, self.b_eq, self.bounds = a_ub, b_ub, a_eq, b_eq, bounds
+        # with highspy only the changed costs are re-optimised from the last basis,
+        # without it every tariff pair is a cold linprog solve of the LP built once per month
+        self.highs = lp.build_highs(c, a_ub, b_ub, a_eq, b_eq, bounds) if lp.highspy is not None else None
+
+    def solve(self, network_tariff_peak, network_tariff_off_peak):
+        # only the costs of the two max demand variables change
+        c = self.c.copy()
+        c[-2:] = [network_tariff_peak, network_tariff_off_peak]
+        if self.highs is not None:
+            self.highs.changeColsCost(2, np.array([len(c) - 2, len(c) - 1], dtype=np.int32),
+                                      np.array(c[-2:], dtype=float))
+            self.highs.run()
+            if self.highs.getModelStatus() != lp.highspy.HighsModelStatus.kOptimal:
+                raise RuntimeError(f"HiGHS failed to solve the EV scheduling LP: {self.highs.getModelStatus()}")
+            return np.array(self.highs.getSolution().col_value), self.highs.getInfo().simplex_iteration_count
+        result = linprog(c, A_ub=self.a_ub, b_ub=self.b_ub, A_eq=self.a_eq, b_eq=self.b_eq, bounds=self.bounds,
+                         method="highs")
+        if result.status != 0:
+            raise RuntimeError(f"HiGHS failed to solve the EV scheduling LP: {result.message}")
+        return result.x, result.nit
+
+
+def sweep_tariffs(num_days, num_periods_day, peak_periods, off_peak_periods,
+                  num_evs, max_charge, total_energy, prices_2d, loads_2d, tariffs, aggregate=True,
+                  interval_hours=0.5):
+    # cost and peak demand frontier of a month over (network_tariff_peak, network_tariff_off_peak) pairs
+    if aggregate:
+        max_charge_units = [num_evs * max_charge]
+        total_energy_units = [num_evs * total_energy]
+    else:
+        max_charge_units = [max_charge] * num_evs
+        total_energy_units = [total_energy] * num_evs
+    prices_2d = np.asarray(prices_2d, dtype=float)
+    loads_2d = np.asarray(loads_2d, dtype=float)
+    num_charges = len(max_charge_units) * num_days * num_periods_day
+
+    # the model is built once for each pair of period sets, which is at most twice per month
+    sweepers = {}
+    frontier = []
+    for network_tariff_peak, network_tariff_off_peak in tariffs:
+        peak_periods2, off_peak_periods2, network_tariff_off_peak2 \
+            = period_sets(num_periods_day, peak_periods, off_peak_periods, network_tariff_peak, network_tariff_off_peak)
+        if (peak_periods2, off_peak_periods2) not in sweepers:
+            with profiling.stage("model build", backend="highs sweep"):
+                c, a_ub, b_ub, a_eq, b_eq, bounds, constant_cost \
+                    = lp.build_lp(num_days, num_periods_day, peak_periods2, off_peak_periods2,
+                                  max_charge_units, total_energy_units, prices_2d, loads_2d, 0, 0,
+                                  interval_hours=interval_hours)
+                sweepers[(peak_periods2, off_peak_periods2)] = (LPSweeper(c, a_ub, b_ub, a_eq, b_eq, bounds),
+                                                                constant_cost)
+        sweeper, constant_cost = sweepers[(peak_periods2, off_peak_periods2)]
+
+        with profiling.stage("solve", backend="highs sweep", network_tariff_peak=network_tariff_peak,
+                             network_tariff_off_peak=network_tariff_off_peak) as record:
+            start_time = perf_counter()
+            x, iterations = sweeper.solve(network_tariff_peak, network_tariff_off_peak2)
+            solve_time = perf_counter() - start_time
+            record["iterations"] = iterations
+
+        charge_2d = x[:num_charges].reshape((-1, num_days, num_periods_day)).sum(axis=0)
+        demand_2d = charge_2d + loads_2d / interval_hours
+        max_demand_peak = float(demand_2d[:, list(peak_periods2)].max()) if peak_periods2 else 0
+        max_demand_off_peak = float(demand_2d[:, list(off_peak_periods2)].max()) if off_peak_periods2 else 0
+        wholesale_cost = float(sweeper.c[:-2] @ x[:-2]) + constant_cost
+        network_charge = network_tariff_peak * max_demand_peak + network_tariff_off_peak2 * max_demand_off_peak
+        frontier.append({
+            "network_tariff_peak": network_tariff_peak,
+            "network_tariff_off_peak": network_tariff_off_peak,
+            "wholesale_cost": wholesale_cost,
+            "network_charge": network_charge,
+            "objective": wholesale_cost + network_charge,
+            "max_demand_peak": max_demand_peak,
+            "max_demand_off_peak": max_demand_off_peak,
+            "iterations": iterations,
+            "time (ms)": solve_time * 1000,
+        })
+    return pd.DataFrame(frontier)
@@ -0,0 +1,21 @@
+import pytest
+import scripts.ev_decomposition as decomposition
+import scripts.ev_scheduling_lp as lp
+from benchmarks.benchmark_scheduling import make_synthetic_month
+
+
+@pytest.mark.parametrize("network_tariff_peak, network_tariff_off_peak, aggregate, num_evs", [
+    (15, 3, True, 1000),
+    (0, 15, True, 1000),
+    (10, 10, True, 1000),
+    (15, 3, False, 5),
+])
+def test_decomposition_matches_lp(network_tariff_peak, network_tariff_off_peak, aggregate, num_evs):
+    prices_2d, loads_2d = make_synthetic_month(10, 16)
+    args = (10, 16, {14, 15}, set(range(14)), num_evs, 25, 20, prices_2d, loads_2d,
+            network_tariff_peak, network_tariff_off_peak)
+    _, outputs_decomposed = decomposition.schedule_evs_decomposed(*args, aggregate=aggregate)
+    _, outputs_lp = lp.schedule_evs_lp(*args, aggregate=aggregate)
+    objective_decomposed = outputs_decomposed["wholesale_cost"][0] + outputs_decomposed["network_charge"][0]
+    objective_lp = outputs_lp["wholesale_cost"][0] + outputs_lp["network_charge"][0]
+    assert objective_decomposed == pytest.approx(objective_lp, rel=1e-5)
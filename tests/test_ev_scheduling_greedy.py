@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import scripts.ev_scheduling_greedy as greedy
+import scripts.ev_scheduling_lp as lp
+from benchmarks.benchmark_scheduling import make_synthetic_month
+
+
+@pytest.mark.parametrize("network_tariff_peak, network_tariff_off_peak, aggregate, num_evs", [
+    (15, 3, True, 1000),
+    (0, 15, True, 1000),
+    (10, 10, True, 1000),
+    (0, 0, True, 1000),
+    (15, 3, False, 5),
+])
+def test_greedy_matches_lp(network_tariff_peak, network_tariff_off_peak, aggregate, num_evs):
+    # the greedy schedule of identical EVs is optimal up to the tolerance of its peak demand search,
+    # which costs at most a few times the tariffs per kW of tolerance
+    prices_2d, loads_2d = make_synthetic_month(10, 16)
+    args = (10, 16, {14, 15}, set(range(14)), num_evs, 25, 20, prices_2d, loads_2d,
+            network_tariff_peak, network_tariff_off_peak)
+    tolerance = 0.01
+    charge_ev_day_period, outputs_greedy = greedy.schedule_evs_greedy(*args, aggregate=aggregate,
+                                                                      tolerance=tolerance)
+    _, outputs_lp = lp.schedule_evs_lp(*args, aggregate=aggregate)
+    objective_greedy = outputs_greedy["wholesale_cost"][0] + outputs_greedy["network_charge"][0]
+    objective_lp = outputs_lp["wholesale_cost"][0] + outputs_lp["network_charge"][0]
+    assert objective_lp * (1 - 1e-9) <= objective_greedy
+    assert objective_greedy - objective_lp <= 2 * (network_tariff_peak + network_tariff_off_peak) * tolerance + 1e-6
+
+    # every EV gets its energy each day within its charge limit
+    charge_ev_day_period = np.asarray(charge_ev_day_period)
+    assert charge_ev_day_period.shape == (1 if aggregate else num_evs, 10, 16)
+    energy_day = charge_ev_day_period.sum(axis=(0, 2)) * 0.5
+    assert energy_day == pytest.approx(np.full(10, num_evs * 20))
+    assert charge_ev_day_period.max() <= (num_evs if aggregate else 1) * 25 * (1 + 1e-9)
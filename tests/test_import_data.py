@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scripts.import_data as input
+from benchmarks.benchmark_scheduling import write_synthetic_csvs
+
+
+def rewrite_csvs(files, transform):
+    for file in files:
+        transform(pd.read_csv(file)).to_csv(file, index=False)
+
+
+def test_resolution_of_unsorted_data(tmp_path):
+    files = write_synthetic_csvs(tmp_path, 40, resolution=15)
+    months = input.read_data("9:00", "16:45", *files, store_dir=tmp_path / "sorted")[2]
+    rewrite_csvs(files, lambda df: df.sample(frac=1, random_state=0))
+    prices_year, _, months_shuffled, _ = input.read_data("9:00", "16:45", *files, store_dir=tmp_path / "shuffled")
+    assert input.read_resolution(tmp_path / "shuffled") == 15
+    assert list(months_shuffled) == list(months)
+    assert prices_year[0].shape == (31, 32)
+
+
+def test_resolution_must_divide_a_day(tmp_path):
+    files = write_synthetic_csvs(tmp_path, 2, resolution=30)
+    rewrite_csvs(files, lambda df: df.assign(Datetime=pd.Timestamp("2019-03-01")
+                                             + pd.to_timedelta(7 * np.arange(len(df)), unit="min")))
+    with pytest.raises(ValueError, match="does not divide a day"):
+        input.ingest_data(*files, store_dir=tmp_path / "store")
+
+
+def test_days_without_data_are_left_out(tmp_path):
+    files = write_synthetic_csvs(tmp_path, 40, resolution=30)
+    rewrite_csvs(files, lambda df: df[~df["Datetime"].str.startswith("2019-03-05")])
+    prices_year, loads_year, months, datetimes_year = input.read_data("9:00", "16:30", *files,
+                                                                      store_dir=tmp_path / "store")
+    assert [str(month) for month in months] == ["2019-03", "2019-04"]
+    assert prices_year[0].shape == loads_year[0].shape == (30, 16)
+    assert np.datetime64("2019-03-05T09:00") not in datetimes_year[0]
+    assert not np.isnan(prices_year[0]).any()
+
+
+def test_partially_missing_day_is_rejected(tmp_path):
+    files = write_synthetic_csvs(tmp_path, 40, resolution=30)
+    rewrite_csvs(files, lambda df: df[df["Datetime"] != "2019-03-05 12:00:00"])
+    with pytest.raises(ValueError, match="Missing prices or loads of 1 periods in 2019-03"):
+        input.read_data("9:00", "16:30", *files, store_dir=tmp_path / "store")
+
+
+def test_overnight_window(tmp_path):
+    # 62 days from March: the last day, May 1, has no next day and so no overnight window
+    files = write_synthetic_csvs(tmp_path, 62, resolution=5)
+    prices_year, loads_year, months, datetimes_year = input.read_data("18:00", "7:55", *files,
+                                                                      store_dir=tmp_path / "store")
+    assert [str(month) for month in months] == ["2019-03", "2019-04"]
+    assert prices_year[1].shape == loads_year[1].shape == datetimes_year[1].shape == (30, 168)
+    assert datetimes_year[0][0, 0] == np.datetime64("2019-03-01T18:00")
+    assert datetimes_year[0][0, -1] == np.datetime64("2019-03-02T07:55")
+    prices = pd.read_csv(files[0], index_col=0, parse_dates=True)["WholesalePrice"]
+    assert prices_year[0][0, -1] == pytest.approx(prices[pd.Timestamp("2019-03-02 07:55")])
@@ -0,0 +1,28 @@
+import tracemalloc
+import scripts.profiling as profiling
+
+
+def trace_run(trace_file, memory):
+    profiling.start_trace(trace_file, memory, truncate=True)
+    # a worker process joining the run appends to the trace file
+    profiling.start_trace(trace_file, memory)
+    for month in ("2019-03", "2019-04"):
+        with profiling.tags(month=month), profiling.stage("solve"):
+            pass
+
+
+def test_trace_of_a_run(tmp_path):
+    trace_file = str(tmp_path / "trace.jsonl")
+    trace_run(trace_file, memory=False)
+    trace_run(trace_file, memory=False)
+    stages = profiling.summarise(trace_file)
+    assert stages["solve"]["count"] == 2
+    assert stages["solve"]["max_memory_mb"] is None
+    assert "-" in profiling.format_summary(stages)
+
+    trace_run(trace_file, memory=True)
+    stages = profiling.summarise(trace_file)
+    assert stages["solve"]["count"] == 2
+    assert stages["solve"]["max_memory_mb"] >= 0
+    profiling.start_trace(None)
+    tracemalloc.stop()
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+import scripts.result_store as store
+
+minizinc_outputs = {"wholesale_cost": [1.0], "network_charge": [2.0], "max_demand_peak": [3.0],
+                    "max_demand_off_peak": [4.0], "time (ms)": [5.0]}
+
+
+def test_schedule_reads(tmp_path):
+    charge_ev_day_period = np.random.default_rng(0).random((2500, 3, 4))
+    store.save_month(tmp_path, "2019-03", 15, 3, charge_ev_day_period, minizinc_outputs, num_evs=2500)
+    with np.load(tmp_path / store.schedule_file_name("2019-03", 15, 3)) as chunks:
+        assert chunks[store.chunk_name(0, 2)].shape == (500, 4)
+
+    assert np.array_equal(store.load_schedule(tmp_path, "2019-03", 15, 3), charge_ev_day_period)
+    assert np.array_equal(store.load_schedule(tmp_path, "2019-03", 15, 3, day=1), charge_ev_day_period[:, 1])
+    assert np.array_equal(store.load_schedule(tmp_path, "2019-03", 15, 3, ev=2042), charge_ev_day_period[2042])
+    assert np.array_equal(store.load_schedule(tmp_path, "2019-03", 15, 3, day=2, ev=999),
+                          charge_ev_day_period[999, 2])
+
+
+def test_index_of_an_aggregate_run(tmp_path):
+    pd = pytest.importorskip("pandas")
+    charge_ev_day_period = np.ones((1, 3, 4))
+    for network_tariff_peak in (15, 10, 15):
+        store.save_month(tmp_path, "2019-03", network_tariff_peak, 3, charge_ev_day_period, minizinc_outputs,
+                         num_evs=1000, aggregate=True)
+    index = store.read_index(tmp_path)
+    assert sorted(index["network_tariff_peak"]) == [10, 15]
+    assert list(index["num_evs"]) == [1000, 1000]
+    assert list(index["aggregate"]) == [True, True]
+    assert np.array_equal(store.load_schedule(tmp_path, "2019-03", 15, 3), charge_ev_day_period)
+    assert isinstance(index, pd.DataFrame)
@@ -0,0 +1,26 @@
+import scripts.ev_scheduling as ev
+import scripts.scenario_runner as runner
+from benchmarks.benchmark_scheduling import make_synthetic_month
+
+
+def make_scenario(total_energy, **options):
+    prices_2d, loads_2d = make_synthetic_month(5, 16)
+    return dict(num_days=5, num_periods_day=16, peak_periods={14, 15}, off_peak_periods=set(range(14)),
+                num_evs=100, max_charge=25, total_energy=total_energy, prices_2d=prices_2d, loads_2d=loads_2d,
+                network_tariff_peak=15, network_tariff_off_peak=3, aggregate=True, **options)
+
+
+def test_scenario_without_schedule_does_not_stop_the_others():
+    # 16 half-hour periods at 25 kW charge at most 200 kWh a day
+    scenarios = [make_scenario(20, backend="greedy"), make_scenario(500, backend="greedy"),
+                 make_scenario(20, backend="highs")]
+    results = runner.run_scenarios(scenarios, num_workers=1)
+    assert [charge_ev_day_period is None for charge_ev_day_period, _ in results] == [False, True, False]
+    assert "infeasible" in results[1][1]["error"][0]
+
+
+def test_solve_settings_of_highs_are_not_cached(tmp_path):
+    scenario = make_scenario(20, backend="highs", use_cache=True, cache_dir=str(tmp_path))
+    ev.schedule_evs(**scenario, time_limit=10)
+    ev.schedule_evs(**scenario, mip_gap=0.01, solvers=["cbc"])
+    assert len(list(tmp_path.iterdir())) == 1